@@ -2,10 +2,12 @@
 # 2024-05-31
 # 2025-02-24
 #
-# Version 1.33
+# Version 1.34
 #
 # A brute force csv processing and transforming to create or fill a postgres table
 #
+# Requires pandas (>= 2.0 recommended, older versions parse the date columns value by value), numpy, psycopg2, chardet, tqdm; pyarrow is optional
+#
 # It uses a json config file, which can be combined command line arguments.
 #{
 #    "dbhost": "",          // Obligatory. An url or ip address of target PostgrSQL server
@@ -14,12 +16,12 @@
 #    "dbpass": "",          // Obligatory. A password to autenticate
 #    "dbport": "",          // Optional. Default is 5432
 #    "db_schema_name": "",  // Optional. Default is public
-#    "db_table_name": "",   // Optional. Default is the file's name, can be passed with cml argument --target_table
+#    "db_table_name": "",   // Optional. Default is the file's name, can be passed with cml argument --target_table. Ignored with csv_glob, where every file has its own table
 #    "db_table_comment": "",// Optional. Default is NULL, can be passed with cml argument --table_comment
 #    "csv_file": "",        // Obligatory. Data file name we would like to process. Can be passed as a cml argument --csv-file
 #    "csv_sep": ";"         // Optional. Default is ,
 #    "csv_quote": "'",      // Optional. Default is "
-#    "dry_run": true,       // Optional. Default is true, which means printing all SQL commands to the stdout, no operations. If true, executing SQL commands on the server
+#    "dry_run": true,       // Optional. Default is true, which means printing all SQL commands to the stdout (or dry_run_output), no operations and no database connection. If false, executing SQL commands on the server
 #    "create_table": true,  // Optional. Default is creating create table command for `db_table_name` in `db_schema_name`. If false, we assume, the target table is already exists.
 #    "insert_rows": true,   // Optional. Default is creating insert rows command for `db_table_name`
 #    "delete_data": false,  // Optional. Delete data from `db_table_name` before inserting new lines. It has no meaning if the table is a newly created one.
@@ -27,17 +29,88 @@
 #    "sample_size": 10000,  // Optional. Default is reading 3000-10000 lines as a sample from the file (depending on the file length) to analyse the column types
 #    "row_error_check": false  // Optional. Default is no row based error checking. If true each line will be inserted separately and printing error messages for the spcific row.
 #    "sql_copy_no": false   // Optional: Default is false. If sql_copy is not allowed on the sql server, turn this on. This is much slower than the sql_copy.
+#    "chunk_size": 0        // Optional: Default is 0, reading the whole file into the memory at once. If > 0, the file is read, cleaned and sent to the server in chunks of this many rows,
+#                           //           and in COPY mode all chunks are streamed into one COPY command, so the memory usage does not depend on the file size. E.g. 100000
+#    "vectorized_cleaning": true // Optional: Default is true, the COPY data is cleaned column by column with pandas/numpy operations. If false, the old row by row cleaning is used.
+#    "csv_glob": "",        // Optional: A file pattern (e.g. "exports/*.csv") or a directory. All matching files are imported, each into its own table named after the file. Can be passed as a cml argument --csv_glob
+#    "workers": 4           // Optional: Default is 4. Number of files imported at the same time with csv_glob, each worker process uses its own database connection. Can be passed as a cml argument --workers
+#    "parallel_copy": 0     // Optional: Default is 0. If > 1, a big file is split into this many parts at line boundaries, and the parts are cleaned and COPY-ed by parallel processes over separate connections.
+#                           //           Only in COPY mode. Quoted values with line breaks are not supported.
+#    "staging_table": false // Optional: Default is false. With parallel_copy, load into an UNLOGGED <table>_staging table first, which is swapped in (or inserted into the existing table) at the end in one transaction.
+#    "type_cache": "",      // Optional: Default is no cache. An SQLite file name, e.g. "csv_proc_types.sqlite". The detected column types are stored there by the file fingerprint
+#                           //           (header, size, modification time, hash of the first 64K), and reused when the same file is imported again.
+#    "type_cache_size": 200,// Optional: Default is 200. Maximum number of files in the type cache, the least recently used ones are dropped.
+#    "type_cache_refresh": false // Optional: Default is false. If true, the types are detected again and the cache entry is replaced. Can be passed as a cml argument --refresh_types. --clear_type_cache empties the whole cache.
+#    "typed_parsing": true  // Optional: Default is true. The detected types are used when reading the whole file: text as arrow strings or category, dates with a known format, INTEGER as Int32.
+#                           //           Uses much less memory than the python object columns. If false, pandas detects the types again.
+#    "reader": "pandas"     // Optional: Default is "pandas". "pyarrow" reads the file with the multithreaded pyarrow CSV reader (if pyarrow is installed).
+#                           //           Falls back to pandas if csv_sep or csv_quote is not a single character. parallel_copy always uses pandas.
+#    "copy_format": "text"  // Optional: Default is "text". "binary" sends the data in the PostgreSQL binary COPY format, the numbers, dates and times are encoded directly
+#                           //           from the numpy arrays, so neither side has to format and parse them as text. Good for big numeric tables.
+#    "bisect_errors": false // Optional: Default is false. If true, the rows are COPY-ed in batches, each in a savepoint. A failing batch is halved again and again until the bad rows are found.
+#                           //           The bad rows are written into the reject file with the error message, all the other rows are loaded. Much faster than row_error_check.
+#                           //           Always uses the text COPY format, copy_format binary is ignored with a warning.
+#    "copy_batch_size": 10000 // Optional: Default is 10000. Batch size of bisect_errors.
+#    "reject_file": ""      // Optional: Default is <csv file name>_rejects.csv. The rejected rows of bisect_errors. It is deleted if there was no error.
+#    "dry_run_output": ""   // Optional: Default is the stdout. The SQL script file of dry_run. If it is a directory, one <table name>.sql file is written for each csv file.
+#    "dry_run_format": "insert" // Optional: Default is "insert", one INSERT per row. "multi_insert" is one INSERT for dry_run_batch_size rows,
+#                           //           "copy" is a COPY ... FROM STDIN with the data, which can be run with psql -f.
+#    "dry_run_batch_size": 1000 // Optional: Default is 1000. Rows of one INSERT with "multi_insert".
+#    "merge_key": []        // Optional: Default is no merge. Column name(s) of the row key, e.g. ["obm_id"] or "site,date". The file is loaded into a temporary table,
+#                           //           and only the new and changed rows are written into the target table with INSERT ... ON CONFLICT DO UPDATE
+#                           //           (a unique index is created on the key if there is none). delete_data is not used with it.
+#    "merge_delete_missing": false // Optional: Default is false. With merge_key, delete the rows of the target table whose key is not in the file.
+#    "change_hash": false   // Optional: Default is false. With merge_key, a hash of each row is stored in the <table>_row_hash table, and on the next import
+#                           //           only the new and changed rows are sent to the server. Not used in dry_run.
+#                           //           The hashes are dropped when the table is created in the run (create_table), or when the table has fewer rows than hashes.
+#                           //           If the rows are updated outside of csv_proc, the hashes are wrong: drop the <table>_row_hash table before the next import.
+#    "indexes": []          // Optional: Default is no index. Indexes created after the load, in the same transaction. A column name for a btree index,
+#                           //           or e.g. {"columns": ["obm_geometry"], "method": "gist"}, {"columns": ["site", "date"], "unique": true, "name": "site_date_idx"}
+#    "drop_indexes": false  // Optional: Default is false. Loading into an existing table, its indexes are dropped before the load and created again after it,
+#                           //           in the same transaction (the table is locked meanwhile). The indexes of the constraints (primary key, unique) and of merge_key are kept.
+#    "geometry": false      // Optional: Default is false. PostGIS geometry columns: the WKT/EWKT text columns become geometry(Point,srid) or geometry(Geometry,srid),
+#                           //           and if there is no such column, a latitude/longitude column pair (e.g. lat/lon, szelesseg/hosszusag) gives a geometry(Point,srid) column.
+#                           //           The points are loaded as hex EWKB. The database needs the postgis extension.
+#    "geometry_srid": 4326  // Optional: Default is 4326. SRID of the WKT values without SRID and of the latitude/longitude points.
+#    "geometry_column": "obm_geometry" // Optional: Default is obm_geometry. Name of the point column made from the latitude/longitude columns.
+#    "latlon_columns": []   // Optional: Default is detecting by the column names. The [latitude, longitude] column names.
+#    "bulk_profile": false  // Optional: Default is false. Session parameters for big loads: synchronous_commit=off, maintenance_work_mem=1GB (index builds), work_mem=256MB,
+#                           //           and the defaults of unlogged_table and analyze are true. The steps are reported in the timings.
+#    "bulk_settings": {}    // Optional: Default is no change. Overrides the session parameters of bulk_profile, e.g. {"maintenance_work_mem": "4GB"}
+#    "unlogged_table": null // Optional: Default (null) is bulk_profile. The new table is created UNLOGGED, and set LOGGED after the load (and the indexes) before the commit.
+#    "analyze": null        // Optional: Default (null) is bulk_profile. ANALYZE the table after the import.
+#    "output": "postgres"   // Optional: Default is "postgres". "csv" or "parquet" writes the cleaned and typed data into files instead of the database, without database connection
+#                           //           (dry_run is not used). The same type detection and cleaning as for COPY, chunk by chunk with chunk_size.
+#                           //           csv: ISO dates, NULL is an empty field, loadable with COPY ... (FORMAT csv, HEADER). parquet: one part-NNNNN.parquet file per chunk,
+#                           //           typed columns (int32, float32/64, date32, time32, timestamp, string; geometries as hex EWKB/EWKT strings). parquet needs pyarrow.
+#    "output_path": ""      // Optional: Default is <csv file name>_clean.csv or the <csv file name>_parquet directory. csv: a file name, or an existing directory with csv_glob (one <table name>.csv per file).
+#                           //           parquet: a directory, the files of each table are written into its <table name> subdirectory.
+#    "output_csv_sep": ","  // Optional: Default is ,. Separator of the csv output.
+#    "output_partition_by": [] // Optional: Default is no partitioning. Parquet output in <column>=<value>/ subdirectories (hive style) by these columns.
+#    "parquet_compression": "snappy" // Optional: Default is snappy. Also zstd, gzip, none.
+#    "profile": false       // Optional: Default is false. Wall time, CPU time, RSS growth (Linux) and rows/s of the stages (encoding, sampling, inference, parse, clean,
+#                           //           buffer, copy, ...) are measured and appended as one JSON line to <csv file name>_profile.jsonl, or to the given file name.
+#                           //           Can be passed as a cml argument --profile [file name]
 #}
 
 # Usage:
 # python csv_proc.py config.json [--csv_file x.csv] [--target_table table_name] [--table_comment '...']
+# python csv_proc.py config.json --csv_glob 'exports/*.csv' [--workers 8]
+# python csv_proc.py config.json [--refresh_types] [--clear_type_cache]
+# python csv_proc.py config.json --csv_file x.csv --profile [profile.jsonl]
+# python csv_proc.py config.json --csv_file x.csv --output parquet [--output_path x_parquet]
 
 import pandas as pd
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import re
 import sys
-import os 
+import os
 import json
 from datetime import datetime
 import warnings
@@ -47,109 +120,340 @@ import chardet
 from tqdm import tqdm
 from psycopg2.extras import execute_values
 import io
+import csv
+import struct
+from decimal import Decimal
+import mmap
+import hashlib
+import sqlite3
+import glob
+import time
+import platform
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import resource
+except ImportError:
+    # not on Windows
+    resource = None
+
+VERSION = '1.34'
 
 # Elnyomjuk a UserWarning típusú figyelmeztetéseket
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
-# Argumentumok definiálása
-parser = argparse.ArgumentParser(description="CSV Processing application for Postgres SQL Import.")
-parser.add_argument("config_file", help="Config file name")
-parser.add_argument("--csv_file", help="Csv file name")
-parser.add_argument("--target_table", help="Target table name")
-parser.add_argument("--table_comment", help="Table comments")
+# =========================================================
+# Profiling
+# Wall time, CPU time (with the finished child processes) and RSS growth of the import stages.
+# The stages can be nested (the parsing runs inside the cleaning, which runs inside the COPY),
+# each stage gets only its own time, without the stages running inside it.
+# =========================================================
 
-# Argumentumok beolvasása
-args = parser.parse_args()
+def cpu_seconds():
+    cpu = time.process_time()
+    if resource:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += children.ru_utime + children.ru_stime
+    return cpu
 
-# Ellenőrzés, hogy megadott-e a felhasználó argumentumokat
-if not args.config_file:
-    print("Error: No config file name provided!")
-    sys.exit(1)
+def peak_rss_mb(children=False):
+    if not resource:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss / 1024 ** 2 if sys.platform == 'darwin' else maxrss / 1024
 
-# Reading config file
-try:
-    with open(args.config_file, 'r') as config_file:
-        config = json.load(config_file)
-except FileNotFoundError:
-    print(f"Error: The given config file not found: {args.config_file}")
-    sys.exit(1)
-
-file_name = args.csv_file or config.get('csv_file')
-separator = config.get('csv_sep', ',')
-quote = config.get('csv_quote', '"')
-dry_run = config.get('dry_run', True)
-import_data = not dry_run
-insert_rows = config.get('insert_rows', True)
-create_table = config.get('create_table', True)
-delete_data = config.get('delete_data', False)
-encoding = config.get('character_encoding', 'utf8')
-sample_size = config.get('sample_size', 4000)
-row_error_check = config.get('row_error_check', False)
-db_table_name = args.target_table or config.get('db_table_name') or None
-db_table_comment = args.table_comment or config.get('db_table_comment')
-sql_copy_no = config.get('sql_copy_no', False)
-
-if not file_name:
-    print("Error: CSV file name not provided. Please specify either --csv_file argument or 'csv_file' in the config file.")
-    sys.exit(1)
-
-# Detecting character encoding
-with open(file_name, 'rb') as f:
-    result = chardet.detect(f.read(30000))  # Trying to detect using the first 10K bytes
-    encoding = result['encoding']
-
-def count_lines(file_name):
-    with open(file_name, 'r', encoding='utf-8') as f:
-        return sum(1 for _ in f) - 1  # header nélkül
-
-# Sampling strategy
-def get_sample_indices(total_rows):
-    if total_rows <= 3000:
-        return list(range(total_rows))
-
-    max_sample = min(sample_size, total_rows) # sample_size default is 10.000
-
-    # 3 részre osztjuk
-    chunk = max_sample // 3
-
-    start = list(range(0, chunk))
-
-    middle_start = total_rows // 2 - chunk // 2
-    middle = list(range(middle_start, middle_start + chunk))
-
-    end = list(range(total_rows - chunk, total_rows))
-
-    return sorted(set(start + middle + end))
-
-def read_sample_df(file_name, separator, quote):
-    total_rows = count_lines(file_name)
-    sample_indices = set(get_sample_indices(total_rows))
-
-    def skip_func(i):
-        # i = sor index, 0 = header
-        if i == 0:
-            return False
-        return (i - 1) not in sample_indices
-
-    df = pd.read_csv(
-        file_name,
-        sep=separator,
-        quotechar=quote,
-        skiprows=skip_func,
-        low_memory=False
-    )
 
-    return df
+def round_mb(mb):
+    return round(mb, 1) if mb is not None else None
+
+def current_rss_mb():
+    # Only on Linux, the resident pages of the process now (ru_maxrss is the peak of the whole process lifetime)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Profiler:
+    """
+    Accumulated times of the named stages. A disabled profiler measures nothing.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.stack = []
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'rows': 0, 'calls': 0, 'rss_growth_mb': None})
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        if not self.enabled:
+            yield
+            return
+
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        rss_start = current_rss_mb()
+        self.stack.append([0.0, 0.0, 0.0])
+        try:
+            yield
+        finally:
+            inner_wall, inner_cpu, inner_rss = self.stack.pop()
+            wall = time.perf_counter() - wall_start
+            cpu = cpu_seconds() - cpu_start
+            rss_end = current_rss_mb()
+            rss = rss_end - rss_start if rss_start is not None and rss_end is not None else None
+
+            stage = self._stage(name)
+            stage['wall'] += wall - inner_wall
+            stage['cpu'] += cpu - inner_cpu
+            stage['rows'] += rows
+            stage['calls'] += 1
+            # The memory kept by the stage itself (can be negative if it frees more than it allocates)
+            if rss is not None:
+                stage['rss_growth_mb'] = (stage['rss_growth_mb'] or 0.0) + rss - inner_rss
+
+            if self.stack:
+                self.stack[-1][0] += wall
+                self.stack[-1][1] += cpu
+                self.stack[-1][2] += rss or 0.0
+
+    def iterate(self, name, items):
+        # Every next() of the iterator is measured, and the rows of the DataFrame items are counted
+        if not self.enabled:
+            return items
+        return self._iterate(name, items)
+
+    def _iterate(self, name, items):
+        items = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+            if isinstance(item, pd.DataFrame):
+                self._stage(name)['rows'] += len(item)
+            yield item
+
+    def count_rows(self, name, rows):
+        # The rows of a stage which does not see them itself (e.g. the reads of the COPY stream), counted by the caller
+        if self.enabled:
+            self._stage(name)['rows'] += rows
+
+    def report(self):
+        # rows and rows_per_s are None for the stages which do not process the rows (e.g. the encoding detection)
+        report = {}
+        for name, stage in self.stages.items():
+            stage_rows = stage['rows'] or None
+            report[name] = {
+                'wall_s': round(stage['wall'], 4),
+                'cpu_s': round(stage['cpu'], 4),
+                'rows': stage_rows,
+                'rows_per_s': round(stage_rows / stage['wall']) if stage_rows and stage['wall'] > 0 else None,
+                'calls': stage['calls'],
+                'rss_growth_mb': round_mb(stage['rss_growth_mb']),
+            }
+        return report
+
+NO_PROFILER = Profiler(enabled=False)
+
+# The options written into the profile report
+PROFILE_OPTIONS = [
+    'chunk_size', 'vectorized_cleaning', 'typed_parsing', 'reader', 'copy_format', 'parallel_copy', 'staging_table',
+    'row_error_check', 'sql_copy_no', 'bisect_errors', 'merge_key', 'change_hash', 'geometry', 'bulk_profile', 'dry_run', 'dry_run_format', 'output'
+]
+
+def write_profile(profile, file_name, report):
+    # One JSON line per run, so the runs of different versions and files can be compared
+    path = profile if isinstance(profile, str) and profile else os.path.splitext(file_name)[0] + '_profile.jsonl'
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(report, ensure_ascii=False) + '\n')
+
+    print("Profile:")
+    print(f"  {'stage':<20} {'wall s':>9} {'cpu s':>9} {'rows/s':>12} {'RSS +MB':>9}")
+    for name, stage in report['stages'].items():
+        rate = stage['rows_per_s'] if stage['rows_per_s'] is not None else ''
+        rss = stage['rss_growth_mb'] if stage['rss_growth_mb'] is not None else ''
+        print(f"  {name:<20} {stage['wall_s']:>9.3f} {stage['cpu_s']:>9.3f} {rate:>12} {rss:>9}")
+    print(f"Profile report: {path}")
+
+
+# =========================================================
+# File scanning
+# One pass over the raw bytes instead of reading the file several times in text mode:
+# chardet on the head, counting the newlines in big blocks, and the sample lines are
+# picked from the beginning, the middle and the end of the file by byte offsets (mmap).
+# =========================================================
+
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+
+def next_lines(mm, pos, n):
+    # Offset after the next n lines from pos
+    for _ in range(n):
+        nl = mm.find(b'\n', pos)
+        if nl == -1:
+            return len(mm)
+        pos = nl + 1
+    return pos
+
+def previous_lines(mm, end, n):
+    # Offset of the start of the last n lines before end
+    pos = end
+    if pos > 0 and mm[pos - 1:pos] == b'\n':
+        pos -= 1
+    for _ in range(n):
+        nl = mm.rfind(b'\n', 0, pos)
+        if nl == -1:
+            return 0
+        pos = nl
+    return pos + 1
+
+def scan_file(file_name, separator, quote, sample_size, profiler=NO_PROFILER):
+    with open(file_name, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ValueError(f"Empty file: {file_name}")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+            # Detecting character encoding
+            with profiler.stage('encoding'):
+                encoding = chardet.detect(mm[:30000])['encoding']  # Trying to detect using the first 30K bytes
+
+            # Line counting
+            with profiler.stage('line count'):
+                lines = sum(mm[i:i + SCAN_BLOCK_SIZE].count(b'\n') for i in range(0, size, SCAN_BLOCK_SIZE))
+                if mm[size - 1:size] != b'\n':
+                    lines += 1
+            total_rows = lines - 1  # header nélkül
+
+            # Sampling strategy
+            header_end = next_lines(mm, 0, 1)
+
+            if total_rows <= 3000:
+                data = mm[:]
+            else:
+                max_sample = min(sample_size, total_rows) # sample_size default is 10.000
+
+                # 3 részre osztjuk
+                chunk = max_sample // 3
+
+                start_end = next_lines(mm, header_end, chunk)
+
+                middle_start = max(next_lines(mm, size // 2, 1), start_end)
+                middle_end = next_lines(mm, middle_start, chunk)
+
+                end_start = max(previous_lines(mm, size, chunk), middle_end)
+
+                data = mm[:start_end] + mm[middle_start:middle_end] + mm[end_start:]
+                if not data.endswith(b'\n'):
+                    data += b'\n'
+
+    with profiler.stage('sampling'):
+        sample_df = pd.read_csv(
+            io.BytesIO(data),
+            sep=separator,
+            quotechar=quote,
+            low_memory=False
+        )
+
+    return encoding, total_rows, sample_df
+
+
+# =========================================================
+# Type cache
+# The scan results (encoding, number of rows, column types) are stored in an SQLite file,
+# keyed by the file fingerprint, so a repeated import of the same file skips the sampling and the type detection.
+# The least recently used entries are dropped above type_cache_size.
+# =========================================================
+
+FINGERPRINT_HEAD_SIZE = 65536
+
+def file_fingerprint(file_name, separator, quote, sample_size, options=''):
+    # header signature + size + mtime + hash of the first 64K bytes + the options affecting the detection
+    st = os.stat(file_name)
+    with open(file_name, 'rb') as f:
+        head = f.read(FINGERPRINT_HEAD_SIZE)
+    header = head.split(b'\n', 1)[0].rstrip(b'\r')
+
+    h = hashlib.sha1()
+    h.update(hashlib.sha1(header).digest())
+    h.update(f'{st.st_size}:{st.st_mtime_ns}:{separator}:{quote}:{sample_size}:{options}'.encode('utf-8'))
+    h.update(head)
+    return h.hexdigest()
+
+
+class TypeCache:
+    """
+    SQLite based LRU cache of the detected column types
+    """
+
+    def __init__(self, path, max_entries=200):
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS type_cache (
+                fingerprint TEXT PRIMARY KEY,
+                file_name TEXT,
+                encoding TEXT,
+                total_rows INTEGER,
+                column_types TEXT,
+                last_used REAL
+            )
+        """)
+        self.db.commit()
+
+    def get(self, fingerprint):
+        row = self.db.execute(
+            'SELECT encoding, total_rows, column_types FROM type_cache WHERE fingerprint = ?',
+            (fingerprint,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.db.execute('UPDATE type_cache SET last_used = ? WHERE fingerprint = ?', (time.time(), fingerprint))
+        self.db.commit()
+
+        encoding, total_rows, column_types = row
+        # [[column, type], ...] keeps the column order
+        return encoding, total_rows, dict(json.loads(column_types))
+
+    def put(self, fingerprint, file_name, encoding, total_rows, column_types):
+        self.db.execute(
+            'INSERT OR REPLACE INTO type_cache VALUES (?, ?, ?, ?, ?, ?)',
+            (fingerprint, os.path.abspath(file_name), encoding, total_rows, json.dumps(list(column_types.items())), time.time())
+        )
+        self.db.execute("""
+            DELETE FROM type_cache WHERE fingerprint NOT IN (
+                SELECT fingerprint FROM type_cache ORDER BY last_used DESC LIMIT ?
+            )
+        """, (self.max_entries,))
+        self.db.commit()
+
+    def invalidate(self, file_name=None):
+        # All entries, or the entries of one file
+        if file_name is None:
+            self.db.execute('DELETE FROM type_cache')
+        else:
+            self.db.execute('DELETE FROM type_cache WHERE file_name = ?', (os.path.abspath(file_name),))
+        self.db.commit()
 
-def to_sql_literal(val):
-    if val is None:
-        return 'NULL'
-    if isinstance(val, str):
-        return "'" + val.replace("'", "''") + "'"
-    return str(val)
+    def close(self):
+        self.db.close()
 
 # Type check
+# Regex classifiers run on the whole string array; date formats are guessed once per column
+TIME_PATTERN = r'([01]?\d|2[0-3]):[0-5]?\d(:[0-5]?\d)?'
+FLOAT32_MIN = np.finfo(np.float32).min
+FLOAT32_MAX = np.finfo(np.float32).max
+
 def infer_sql_type(series):
     if series.isnull().all():
         return 'TEXT'
@@ -157,39 +461,190 @@ def infer_sql_type(series):
     if pd.api.types.is_integer_dtype(series):
         max_val = series.max()
         min_val = series.min()
-        if pd.api.types.is_integer_dtype(series) and (min_val >= -2147483648 and max_val <= 2147483647):
+        if min_val >= -2147483648 and max_val <= 2147483647:
             return 'INTEGER'
         else:
             return 'BIGINT'
     elif pd.api.types.is_float_dtype(series):
         max_val = series.max()
         min_val = series.min()
-        if series.apply(lambda x: len(str(x).split('.')[-1]) if '.' in str(x) else 0).max() > 6:
+        # number of decimals in the shortest repr of the values, like str(x)
+        text = pd.Series(series.dropna().to_numpy(dtype='float64').astype(str))
+        dot = text.str.find('.')
+        decimals = (text.str.len() - dot - 1).where(dot >= 0, 0)
+        if decimals.max() > 6:
             return 'NUMERIC'
-        elif np.finfo(np.float32).min <= min_val <= np.finfo(np.float32).max and np.finfo(np.float32).min <= max_val <= np.finfo(np.float32).max:
+        elif FLOAT32_MIN <= min_val <= FLOAT32_MAX and FLOAT32_MIN <= max_val <= FLOAT32_MAX:
             return 'REAL'  # 32 bites lebegőpontos szám
         else:
             return 'DOUBLE PRECISION'  # 64 bites lebegőpontos szám
     else:
+        values = series.dropna()
+
         # Time típus ellenőrzése: csak HH:MM vagy HH:MM:SS formátumú értékek
-        time_pattern = series.dropna().apply(lambda x: isinstance(x, str) and pd.to_datetime(x, format='%H:%M:%S', errors='coerce') is not pd.NaT or
-                                             pd.to_datetime(x, format='%H:%M', errors='coerce') is not pd.NaT)
-        if time_pattern.all():
+        is_str = values.map(type).eq(str).all() if values.dtype == object else pd.api.types.is_string_dtype(values)
+        if is_str and values.str.fullmatch(TIME_PATTERN).all():
             return 'TIME WITHOUT TIME ZONE'
 
         # Timestamp vagy Date típus ellenőrzése
+        # Every value has to be a valid date, so an empty cell or a first value which is not a date means TEXT
+        if len(values) < len(series):
+            return 'TEXT'
         try:
-            converted_series = pd.to_datetime(series, errors='coerce', utc=True)
+            first = str(values.iloc[0])
+            fmt = guess_datetime_format(first)
+            if fmt:
+                converted_series = pd.to_datetime(series, format=fmt, errors='coerce', utc=True)
+            elif pd.isna(pd.to_datetime(first, errors='coerce')):
+                return 'TEXT'
+            else:
+                converted_series = pd.to_datetime(series, errors='coerce', utc=True)
             if converted_series.notnull().all():
                 if (converted_series.dt.hour != 0).any() or (converted_series.dt.minute != 0).any() or (converted_series.dt.second != 0).any():
                     return 'TIMESTAMP WITHOUT TIME ZONE'
                 return 'DATE'
         except Exception:
             pass
-        
+
         # Minden egyéb text
         return 'TEXT'
 
+def detect_column_types(sample_df, columns):
+    # Type detection column by column, reporting the time spent on each column
+    column_types = {}
+    for i, col in enumerate(columns):
+        t0 = time.perf_counter()
+        column_types[col] = infer_sql_type(sample_df.iloc[:, i])
+        print(f"  {col}: {column_types[col]} ({time.perf_counter() - t0:.3f} s)")
+    return column_types
+
+
+# =========================================================
+# Geometry (PostGIS)
+# The WKT/EWKT text columns become geometry columns, and a latitude/longitude column pair gives
+# a new point column. The points are sent as hex EWKB made with numpy, which PostGIS reads without
+# parsing text; the other geometries as EWKT, with the SRID of the column.
+# =========================================================
+
+WKT_TYPES = 'POINT|LINESTRING|POLYGON|MULTIPOINT|MULTILINESTRING|MULTIPOLYGON|GEOMETRYCOLLECTION|CIRCULARSTRING|COMPOUNDCURVE|CURVEPOLYGON|MULTICURVE|MULTISURFACE|POLYHEDRALSURFACE|TRIANGLE|TIN'
+WKT_PATTERN = rf'(?i)\s*(SRID=\d+;)?\s*({WKT_TYPES})\b.*(\)|EMPTY)\s*'
+NUMBER_PATTERN = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+POINT_PATTERN = rf'(?i)^\s*(?:SRID=(?P<srid>\d+);)?\s*POINT\s*\(\s*(?P<x>{NUMBER_PATTERN})\s+(?P<y>{NUMBER_PATTERN})\s*\)\s*$'
+HEX_PATTERN = r'(?:[0-9A-Fa-f]{2})+'
+
+LAT_NAMES = ['lat', 'latitude', 'decimallatitude', 'decimal_latitude', 'wgs84_lat', 'szelesseg', 'szel', 'eov_lat']
+LON_NAMES = ['lon', 'lng', 'long', 'longitude', 'decimallongitude', 'decimal_longitude', 'wgs84_lon', 'hosszusag', 'hossz', 'eov_lon']
+NUMERIC_TYPES = ['INTEGER', 'BIGINT', 'REAL', 'DOUBLE PRECISION', 'NUMERIC']
+
+HEX_DIGITS = np.array([f'{i:02X}'.encode('ascii') for i in range(256)], dtype='S2')
+
+def is_geometry(col_type):
+    return col_type is not None and col_type.lower().startswith('geometry')
+
+def geometry_srid(col_type):
+    m = re.match(r'(?i)geometry\(\w+,\s*(\d+)\)', col_type)
+    return int(m.group(1)) if m else None
+
+def geometry_type(series, srid):
+    # geometry(Point,srid) or geometry(Geometry,srid) if every value is WKT/EWKT, otherwise None
+    values = series.dropna()
+    if values.empty or pd.api.types.is_numeric_dtype(values):
+        return None
+
+    text = values.astype(str).str.strip()
+    text = text[text != '']
+    if text.empty or not text.str.fullmatch(WKT_PATTERN).all():
+        return None
+
+    srids = text.str.extract(r'(?i)^SRID=(\d+);')[0].dropna().unique()
+    if len(srids) > 1:
+        # more SRIDs can't be in one typed column
+        return 'geometry'
+    if len(srids) == 1:
+        srid = int(srids[0])
+
+    kind = 'Point' if text.str.fullmatch(POINT_PATTERN).all() else 'Geometry'
+    return f'geometry({kind},{srid})'
+
+def detect_geometry_columns(sample_df, columns, column_types, srid):
+    for i, col in enumerate(columns):
+        if column_types[col] == 'TEXT':
+            col_type = geometry_type(sample_df.iloc[:, i], srid)
+            if col_type:
+                column_types[col] = col_type
+                print(f"  {col}: {col_type}")
+    return column_types
+
+def find_latlon_columns(columns, column_types, latlon=None):
+    # The latlon_columns of the config, or the first numeric columns with a latitude and a longitude name
+    if latlon:
+        lat, lon = latlon
+        if lat in columns and lon in columns:
+            return lat, lon
+        print(f"Warning: latlon_columns not found in the file: {lat}, {lon}")
+        return None
+
+    lat = next((col for col in columns if col in LAT_NAMES and column_types[col] in NUMERIC_TYPES), None)
+    lon = next((col for col in columns if col in LON_NAMES and column_types[col] in NUMERIC_TYPES), None)
+    return (lat, lon) if lat and lon else None
+
+def ewkb_points(x, y, srid):
+    # Hex EWKB of 2D points: little endian, point type with the SRID flag, SRID, x, y
+    n = len(x)
+    records = np.zeros(n, dtype=[('order', 'u1'), ('type', '<u4'), ('srid', '<u4'), ('x', '<f8'), ('y', '<f8')])
+    records['order'] = 1
+    records['type'] = 0x20000001
+    records['srid'] = srid
+    records['x'] = x
+    records['y'] = y
+    hexed = HEX_DIGITS[records.view(np.uint8).reshape(n, 25)]
+    return np.ascontiguousarray(hexed).view('S50').ravel().astype(str).astype(object)
+
+def geometry_column_values(series, col_type):
+    # Hex EWKB for the points and hex input, EWKT for the other geometries, and the NULL mask
+    null = null_mask(series)
+    text = series.astype(str).str.strip().mask(null)
+    srid = geometry_srid(col_type)
+    values = pd.Series(None, index=series.index, dtype=object)
+
+    is_hex = text.str.fullmatch(HEX_PATTERN).fillna(False).astype(bool)
+    values[is_hex] = text[is_hex]
+
+    points = text.str.extract(POINT_PATTERN)
+    is_point = points['x'].notna() & ~is_hex
+    if is_point.any():
+        p = points[is_point]
+        point_srid = pd.to_numeric(p['srid']).fillna(srid or 0).to_numpy(dtype='uint32')
+        values[is_point] = ewkb_points(p['x'].astype('float64').to_numpy(), p['y'].astype('float64').to_numpy(), point_srid)
+
+    is_wkt = text.str.fullmatch(WKT_PATTERN).fillna(False).astype(bool) & ~is_point & ~is_hex
+    if is_wkt.any():
+        wkt = text[is_wkt]
+        if srid:
+            wkt = wkt.where(wkt.str.upper().str.startswith('SRID='), f'SRID={srid};' + wkt)
+        values[is_wkt] = wkt
+
+    return values, null | values.isna().to_numpy(dtype=bool)
+
+def geometry_value(val, srid):
+    # One value for the row by row modes
+    text = str(val).strip()
+    if re.fullmatch(HEX_PATTERN, text) or text.upper().startswith('SRID=') or not srid:
+        return text
+    return f'SRID={srid};{text}'
+
+def add_point_column(chunks, lat, lon, name, srid):
+    # The point column from the latitude/longitude columns, NULL for the missing or out of range coordinates
+    for df in chunks:
+        y = to_number(df[lat]).astype('float64').to_numpy()
+        x = to_number(df[lon]).astype('float64').to_numpy()
+        valid = np.isfinite(x) & np.isfinite(y) & (np.abs(y) <= 90) & (np.abs(x) <= 180)
+
+        points = np.full(len(df), None, dtype=object)
+        if valid.any():
+            points[valid] = ewkb_points(x[valid], y[valid], srid)
+        yield df.assign(**{name: points})
+
 def escape_copy_value(v):
     if v is None:
         return '\\N'
@@ -212,10 +667,10 @@ def normalize_column_names(df):
     return df
 
 
-def clean_row_func(row):
+def clean_row_func(row, columns, column_types):
     clean_row = []
 
-    for col_name, val in zip(df.columns, row):
+    for col_name, val in zip(columns, row):
         col_type = column_types.get(col_name)
 
         # ---------------------------
@@ -275,6 +730,12 @@ def clean_row_func(row):
             except Exception:
                 clean_row.append(None)
 
+        # ---------------------------
+        # GEOMETRY
+        # ---------------------------
+        elif is_geometry(col_type):
+            clean_row.append(geometry_value(val, geometry_srid(col_type)))
+
         # ---------------------------
         # DEFAULT (TEXT stb.)
         # ---------------------------
@@ -284,201 +745,1992 @@ def clean_row_func(row):
     return tuple(clean_row)
 
 
-print("Sampling data for type detection...")
-sample_df = read_sample_df(file_name, separator, quote)
+# =========================================================
+# Vectorized (column based) cleaning
+# The same rules as clean_row_func(), but one column at a time with pandas/numpy operations.
+# It produces the COPY text values directly: '\N' for NULL, escaped strings otherwise.
+# =========================================================
 
-# Field name normalization based on the sample data
-sample_df = normalize_column_names(sample_df)
+NULL_TOKENS = ['nan', 'none', 'null']
 
-# Field/Column type assign
-print("Detecting column types...")
-column_types = {col: infer_sql_type(sample_df[col]) for col in sample_df.columns}
+def null_mask(series):
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        return series.isna().to_numpy(dtype=bool)
 
-# Reading input file
-with open(file_name, mode='r', encoding='utf-8') as file:
-    #df = pd.read_csv(file, sep=separator, quotechar=quote, escapechar='\\', engine='python')
-    df = pd.read_csv(file, sep=separator, quotechar=quote, low_memory=False)
+    text = series.astype(str)
+    mask = series.isna() | text.str.strip().eq('') | text.str.lower().isin(NULL_TOKENS)
+    return mask.fillna(True).to_numpy(dtype=bool)
 
-# Normalize the column names for the main DataFrame as well
-df = normalize_column_names(df)
+def to_number(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    return pd.to_numeric(series.astype(str).str.strip(), errors='coerce')
 
-# DB Connect, and cursor
-try:
-    conn = psycopg2.connect(
-        host=config['dbhost'],
-        database=config['dbname'],
-        port=config.get('dbport',5432),
-        user=config['dbuser'],
-        password=config['dbpass']
+# format='mixed' and the date_format argument of read_csv are new in pandas 2.0.
+# The older versions parse the values one by one without a format, and the date columns are parsed after reading.
+PANDAS_2 = int(pd.__version__.split('.')[0]) >= 2
+MIXED_FORMAT = 'mixed' if PANDAS_2 else None
+
+def parse_datetime_column(series):
+    # Already parsed
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    values = series.dropna().astype(str)
+    if values.empty:
+        return pd.to_datetime(series, errors='coerce')
+
+    # Guessing the format once from the first value, and parsing the whole column with it.
+    # The values which are not fit the guessed format are parsed one by one, like in clean_row_func()
+    fmt = guess_datetime_format(values.iloc[0])
+    try:
+        if fmt:
+            parsed = pd.to_datetime(series, format=fmt, errors='coerce')
+            rest = parsed.isna() & series.notna()
+            if rest.any():
+                parsed[rest] = pd.to_datetime(series[rest], format=MIXED_FORMAT, errors='coerce')
+        else:
+            parsed = pd.to_datetime(series, format=MIXED_FORMAT, errors='coerce')
+    except (ValueError, TypeError):
+        # e.g. mixed time zones
+        parsed = series.map(lambda v: pd.to_datetime(v, errors='coerce')).astype('datetime64[ns]')
+    return parsed
+
+def escape_copy_column(text):
+    # The same as escape_copy_value()
+    return (
+        text.str.replace('\\', '\\\\', regex=False)
+            .str.replace(r'[\t\n\r]', ' ', regex=True)
     )
 
-except psycopg2.OperationalError as e:
-    if "does not exist" in str(e):
-        print(f"Error: The '{config['dbname']}' database does not exists. Try gisdata")
+# The cleaned values of a column and its NULL mask:
+# numbers, datetimes, 'HH:MM:SS' strings for TIME and not escaped strings for TEXT
+def clean_column_values(series, col_type):
+    null = null_mask(series)
+
+    # ---------------------------
+    # INTEGER / BIGINT
+    # ---------------------------
+    if col_type in ['INTEGER', 'BIGINT']:
+        values = to_number(series)
+        if not pd.api.types.is_integer_dtype(values):
+            values = np.trunc(values.astype('float64'))
+            values = values.where(np.isfinite(values) & (values.abs() < 2**63))
+        null = null | values.isna().to_numpy(dtype=bool)
+
+    # ---------------------------
+    # FLOAT / NUMERIC
+    # ---------------------------
+    elif col_type in ['REAL', 'DOUBLE PRECISION', 'NUMERIC']:
+        values = to_number(series).astype('float64')
+        null = null | values.isna().to_numpy(dtype=bool)
+
+    # ---------------------------
+    # TIME
+    # ---------------------------
+    elif col_type == 'TIME WITHOUT TIME ZONE':
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.astype(str)
+        else:
+            # %H:%M or %H:%M:%S, validated with a regex instead of strptime
+            text = series.astype(str).mask(null)
+            valid = text.str.fullmatch(TIME_PATTERN).fillna(False).astype(bool)
+            parts = text.where(valid).str.split(':', expand=True).reindex(columns=[0, 1, 2])
+            values = parts[0].str.zfill(2) + ':' + parts[1].str.zfill(2) + ':' + parts[2].fillna('0').str.zfill(2)
+            null = null | ~valid.to_numpy(dtype=bool)
+
+    # ---------------------------
+    # DATE / TIMESTAMP
+    # ---------------------------
+    elif col_type in ['DATE', 'TIMESTAMP WITHOUT TIME ZONE']:
+        values = parse_datetime_column(series.mask(null))
+        null = null | values.isna().to_numpy(dtype=bool)
+
+    # ---------------------------
+    # GEOMETRY
+    # ---------------------------
+    elif is_geometry(col_type):
+        values, null = geometry_column_values(series, col_type)
+
+    # ---------------------------
+    # DEFAULT (TEXT stb.)
+    # ---------------------------
+    else:
+        values = series.astype(str)
+
+    return values, null
+
+def clean_column(series, col_type):
+    values, null = clean_column_values(series, col_type)
+
+    if col_type in ['INTEGER', 'BIGINT']:
+        text = values.astype('Int64').astype(str)
+    elif col_type in ['REAL', 'DOUBLE PRECISION', 'NUMERIC']:
+        text = pd.Series(values.to_numpy().astype(str), index=series.index)
+    elif col_type == 'TIME WITHOUT TIME ZONE':
+        text = values
+    elif col_type in ['DATE', 'TIMESTAMP WITHOUT TIME ZONE']:
+        fmt = '%Y-%m-%d' if col_type == 'DATE' else '%Y-%m-%d %H:%M:%S'
+        text = values.dt.strftime(fmt)
+    else:
+        text = escape_copy_column(values)
+
+    return np.where(null, '\\N', text.to_numpy(dtype=object))
+
+def clean_chunk_func(df, columns, column_types):
+    # COPY text block of a whole DataFrame
+    if df.empty:
+        return ''
+
+    cleaned = [
+        pd.Series(clean_column(df.iloc[:, i], column_types.get(col)), dtype=object)
+        for i, col in enumerate(columns)
+    ]
+    lines = cleaned[0].str.cat(cleaned[1:], sep='\t') if len(cleaned) > 1 else cleaned[0]
+    return '\n'.join(lines) + '\n'
+
+
+# =========================================================
+# Dry run SQL
+# The dry run output is made from whole chunks, like the COPY text, and written into a buffered file.
+# The values are the same as the clean_row_func() values, as SQL literals.
+# =========================================================
+
+DRY_RUN_BUFFER_SIZE = 1024 * 1024
+
+def sql_literal_column(series, col_type):
+    values, null = clean_column_values(series, col_type)
+
+    if col_type in ['INTEGER', 'BIGINT']:
+        text = values.astype('Int64').astype(str)
+    elif col_type in ['REAL', 'DOUBLE PRECISION', 'NUMERIC']:
+        text = pd.Series(values.to_numpy().astype(str), index=series.index)
+    elif col_type == 'TIME WITHOUT TIME ZONE':
+        text = "'" + values + "'"
+    elif col_type in ['DATE', 'TIMESTAMP WITHOUT TIME ZONE']:
+        fmt = '%Y-%m-%d' if col_type == 'DATE' else '%Y-%m-%d %H:%M:%S'
+        text = "'" + values.dt.strftime(fmt) + "'"
     else:
-        print("Error: Unsuccesful connect to the PostgreSQL database.")
-        print(f"Host: {config['dbhost']}")
-        print(f"Database: {config['dbname']}")
-        print("Check the host name, database name, the connection parameters, and whether the server is running.")
-    sys.exit(1)
+        text = "'" + values.str.replace("'", "''", regex=False) + "'"
+
+    return np.where(null, 'NULL', text.to_numpy(dtype=object))
+
+def sql_values_chunk(df, columns, column_types):
+    # '(v1, v2, ...)' for every row
+    cleaned = [
+        pd.Series(sql_literal_column(df.iloc[:, i], column_types.get(col)), dtype=object)
+        for i, col in enumerate(columns)
+    ]
+    values = cleaned[0].str.cat(cleaned[1:], sep=', ') if len(cleaned) > 1 else cleaned[0]
+    return ('(' + values + ')').tolist()
+
+def dry_run_blocks(chunks, columns, column_types, target, dry_run_format='insert', batch_size=1000):
+    if dry_run_format == 'copy':
+        yield f'COPY {target} FROM STDIN;\n'
+        for df in chunks:
+            yield clean_chunk_func(df, columns, column_types)
+        yield '\\.\n'
+        return
+
+    for df in chunks:
+        if df.empty:
+            continue
+        rows = sql_values_chunk(df, columns, column_types)
+
+        if dry_run_format == 'multi_insert':
+            yield ''.join(
+                f'INSERT INTO {target} VALUES\n' + ',\n'.join(rows[i:i + batch_size]) + ';\n'
+                for i in range(0, len(rows), batch_size)
+            )
+        else:
+            yield ''.join(f'INSERT INTO {target} VALUES {row};\n' for row in rows)
+
+def dry_run_output_file(output, table_name):
+    # A directory is for --csv_glob: one script per table
+    if os.path.isdir(output):
+        return os.path.join(output, f'{table_name}.sql')
+    return output
+
+
+# =========================================================
+# Output files
+# The cleaned and typed data without a database: a csv file, or parquet files, written chunk by chunk.
+# The values are the same as the COPY values (clean_column_values), NULL is an empty csv field.
+# =========================================================
+
+PARQUET_TYPES = {
+    'INTEGER': 'int32',
+    'BIGINT': 'int64',
+    'REAL': 'float32',
+    'DOUBLE PRECISION': 'float64',
+    'NUMERIC': 'float64',
+    'DATE': 'date32',
+    'TIMESTAMP WITHOUT TIME ZONE': 'timestamp[us]',
+    'TIME WITHOUT TIME ZONE': 'time64[us]',
+}
+
+def output_path(output, path, file_name, table_name):
+    # Default: next to the csv file. A csv output directory is for --csv_glob, the parquet files are always in a <table name> subdirectory
+    if not path:
+        return os.path.splitext(file_name)[0] + ('_clean.csv' if output == 'csv' else '_parquet')
+    if output == 'parquet':
+        return os.path.join(path, table_name)
+    if os.path.isdir(path):
+        return os.path.join(path, f'{table_name}.csv')
+    return path
+
+def clean_frame(df, columns, column_types):
+    # The cleaned values as a DataFrame: nullable integers, floats, datetimes, strings, with NA for NULL
+    cleaned = {}
+    for i, col in enumerate(columns):
+        col_type = column_types.get(col)
+        values, null = clean_column_values(df.iloc[:, i], col_type)
+
+        if col_type in ['INTEGER', 'BIGINT']:
+            values = values.astype('Int64')
+        elif col_type in ['REAL', 'DOUBLE PRECISION', 'NUMERIC']:
+            values = values.astype('float64')
+        elif col_type == 'TEXT':
+            # tabs and line breaks as in the COPY text
+            values = values.astype('string').str.replace(r'[\t\n\r]', ' ', regex=True)
+        elif col_type not in ['DATE', 'TIMESTAMP WITHOUT TIME ZONE']:
+            values = values.astype('string')
+        cleaned[col] = values.mask(null)
+    return pd.DataFrame(cleaned, index=df.index)
+
+class CsvSink:
+    def __init__(self, path, columns, column_types, separator=','):
+        self.path = path
+        self.column_types = column_types
+        self.separator = separator
+        self.file = open(path, 'w', encoding='utf-8', newline='', buffering=DRY_RUN_BUFFER_SIZE)
+        self.header = True
+
+    def write(self, df):
+        for col, col_type in self.column_types.items():
+            if col_type == 'DATE':
+                df[col] = df[col].dt.strftime('%Y-%m-%d')
+            elif col_type == 'TIMESTAMP WITHOUT TIME ZONE':
+                df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+        df.to_csv(self.file, sep=self.separator, index=False, header=self.header, lineterminator='\n')
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    # One part-NNNNN.parquet file per chunk in the directory, or hive style <column>=<value>/ subdirectories with partition_by
+    def __init__(self, path, columns, column_types, partition_by=None, compression='snappy'):
+        self.path = path
+        self.partition_by = partition_by or []
+        self.compression = compression
+        self.part = 0
+        self.schema = pyarrow.schema([
+            (col, pyarrow.type_for_alias(PARQUET_TYPES.get(column_types.get(col), 'string')))
+            for col in columns
+        ])
+        os.makedirs(path, exist_ok=True)
+        for old in glob.glob(os.path.join(path, '**', 'part-*.parquet'), recursive=True):
+            os.unlink(old)
+
+    def table(self, df):
+        arrays = []
+        for field in self.schema:
+            values = df[field.name]
+            if pyarrow.types.is_time(field.type):
+                micros = (pd.to_timedelta(values, errors='coerce').dt.total_seconds() * 1e6).round().astype('Int64')
+                arrays.append(pyarrow.array(micros, type=pyarrow.int64()).cast(field.type))
+            elif pyarrow.types.is_date(field.type):
+                arrays.append(pyarrow.array(values.dt.floor('D'), type=pyarrow.timestamp('us')).cast(field.type))
+            else:
+                arrays.append(pyarrow.array(values, type=field.type, from_pandas=True))
+        return pyarrow.Table.from_arrays(arrays, schema=self.schema)
+
+    def write(self, df):
+        table = self.table(df)
+        name = f'part-{self.part:05d}'
+        if self.partition_by:
+            pyarrow.parquet.write_to_dataset(table, self.path, partition_cols=self.partition_by,
+                                            basename_template=name + '-{i}.parquet', compression=self.compression)
+        else:
+            pyarrow.parquet.write_table(table, os.path.join(self.path, name + '.parquet'), compression=self.compression)
+        self.part += 1
 
-conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-cur = conn.cursor()
+    def close(self):
+        pass
 
-# Creating table name from the file name
-base_name = os.path.splitext(os.path.basename(file_name))[0]
-table_name = db_table_name if db_table_name else ('t' + base_name if base_name[0].isdigit() else base_name)
-schema_name = config['db_schema_name'] if config['db_schema_name'] else 'public'
+def output_sink(output, path, columns, column_types, config):
+    if output == 'csv':
+        return CsvSink(path, columns, column_types, config.get('output_csv_sep', ','))
+    if pyarrow is None:
+        raise RuntimeError("The parquet output needs the pyarrow package")
+    return ParquetSink(path, columns, column_types, config.get('output_partition_by', []), config.get('parquet_compression', 'snappy'))
 
-columns_with_types = ',\n'.join([f'"{col}" {column_types[col]}' for col in df.columns])
-create_table_query = f'CREATE TABLE {schema_name}.{table_name} (\n{columns_with_types});'
-delete_data_query = f'DELETE FROM {schema_name}.{table_name};'
 
-if db_table_comment:
-    safe_comment = db_table_comment.replace("'", "''")
-    create_table_query += f"\nCOMMENT ON TABLE {schema_name}.{table_name} IS '{safe_comment}';"
+# =========================================================
+# Typed parsing
+# The detected SQL types are given back to read_csv: text columns as arrow strings
+# (or category if there are only a few different values), dates parsed with the format guessed
+# from the sample. Numbers are left to the C parser, which can't fail on a dirty value,
+# and the INTEGER columns are stored as nullable Int32 after parsing.
+# Floats stay float64, because float32 would change the values written to the database.
+# =========================================================
 
-if import_data:
-    try:
-        # Begin a transaction
-        cur.execute("BEGIN;")
-        
-        if create_table:
-            cur.execute(create_table_query)
-        
-        if delete_data:
-            print("Do you want to truncate the destination table?")
-            print(f"   `{delete_data_query}`")
-            answer = input("yes/no: ").strip().lower()
-            if answer == 'yes':
-                cur.execute(delete_data_query)
+CATEGORY_RATIO = 0.1
 
-        # Import data
-        if insert_rows:
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.parquet
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    pyarrow = None
+    STRING_DTYPE = None
+
+# read_csv arguments by column position
+def read_options(columns, column_types, sample_df):
+    dtype = {}
+    parse_dates = []
+    date_format = {}
+
+    for i, col in enumerate(columns):
+        col_type = column_types.get(col)
+        sample = sample_df.iloc[:, i].dropna()
+
+        if col_type == 'TEXT' and len(sample) >= 100 and sample.nunique() <= len(sample) * CATEGORY_RATIO:
+            dtype[i] = 'category'
+
+        elif (col_type in ['TEXT', 'TIME WITHOUT TIME ZONE'] or is_geometry(col_type)) and STRING_DTYPE:
+            dtype[i] = STRING_DTYPE
+
+        elif col_type in ['DATE', 'TIMESTAMP WITHOUT TIME ZONE'] and len(sample):
+            fmt = guess_datetime_format(str(sample.iloc[0]))
+            if fmt:
+                parse_dates.append(i)
+                date_format[i] = fmt
+
+    return {'dtype': dtype, 'parse_dates': parse_dates, 'date_format': date_format}
+
+def read_csv_kwargs(options, names):
+    # The date formats by column name
+    if not options:
+        return {}
+    if not PANDAS_2:
+        # No date_format, parse_datetime_column() parses them
+        return {'dtype': options['dtype']}
+    return {
+        'dtype': options['dtype'],
+        'parse_dates': options['parse_dates'],
+        'date_format': {names[i]: fmt for i, fmt in options['date_format'].items()},
+    }
+
+def downcast_chunk(df, columns, column_types):
+    for i, col in enumerate(columns):
+        if column_types.get(col) != 'INTEGER':
+            continue
+
+        series = df.iloc[:, i]
+        if pd.api.types.is_float_dtype(series):
+            values = series.dropna()
+            if not (np.isfinite(values) & (values == np.trunc(values))).all():
+                continue
+        elif not (pd.api.types.is_integer_dtype(series) and isinstance(series.dtype, np.dtype)):
+            continue
+
+        if series.min() >= -2147483648 and series.max() <= 2147483647:
+            df.isetitem(i, series.astype('Int32'))
+    return df
 
-            from tqdm import tqdm
-            from psycopg2.extras import execute_values
-            import io
 
-            print("Preparing data...")
+# =========================================================
+# pyarrow reader
+# Multithreaded CSV parsing with pyarrow.csv. Every column is read as string (or dictionary
+# for the category columns), because pyarrow stops with an error on a value not fitting the
+# type, and the numbers and dates are converted by the cleaning anyway.
+# =========================================================
+
+# The default na_values of pandas.read_csv
+PANDAS_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+def pyarrow_supported(separator, quote):
+    return pyarrow is not None and len(separator) == 1 and len(quote or '') <= 1
+
+def arrow_to_pandas(table):
+    return table.to_pandas(types_mapper={
+        pyarrow.string(): pd.StringDtype('pyarrow'),
+        pyarrow.large_string(): pd.StringDtype('pyarrow'),
+    }.get)
+
+def read_chunks_pyarrow(file_name, separator, quote, chunk_size, options):
+    with open(file_name, mode='r', encoding='utf-8', newline='') as file:
+        header = next(csv.reader(file, delimiter=separator, quotechar=quote or None))
+
+    dtype = options['dtype'] if options else {}
+    column_types = {
+        name: pyarrow.dictionary(pyarrow.int32(), pyarrow.string()) if dtype.get(i) == 'category' else pyarrow.string()
+        for i, name in enumerate(header)
+    }
+
+    read_options = pyarrow.csv.ReadOptions(use_threads=True)
+    parse_options = pyarrow.csv.ParseOptions(delimiter=separator, quote_char=quote or False)
+    convert_options = pyarrow.csv.ConvertOptions(
+        column_types=column_types,
+        null_values=PANDAS_NA_VALUES,
+        strings_can_be_null=True
+    )
+
+    if not chunk_size:
+        yield arrow_to_pandas(pyarrow.csv.read_csv(file_name, read_options, parse_options, convert_options))
+        return
+
+    # Collecting the record batches up to chunk_size rows
+    # The index is the row number in the file, like in the pandas chunks
+    batches = []
+    rows = 0
+    offset = 0
+
+    def chunk(batches):
+        df = arrow_to_pandas(pyarrow.Table.from_batches(batches))
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        return df
+
+    with pyarrow.csv.open_csv(file_name, read_options, parse_options, convert_options) as reader:
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= chunk_size:
+                yield chunk(batches)
+                offset += rows
+                batches = []
+                rows = 0
+    if batches:
+        yield chunk(batches)
+
+
+# Reading the data file in DataFrame chunks
+# chunk_size 0 means the whole file in one piece (the old behaviour)
+# options: typed parsing options from read_options()
+# reader: 'pandas' or 'pyarrow'
+def read_chunks(file_name, separator, quote, chunk_size=0, options=None, columns=None, column_types=None, reader='pandas'):
+
+    def typed(df):
+        df = normalize_column_names(df)
+        if options:
+            df = downcast_chunk(df, columns, column_types)
+        return df
+
+    if reader == 'pyarrow':
+        if pyarrow_supported(separator, quote):
+            for df in read_chunks_pyarrow(file_name, separator, quote, chunk_size, options):
+                yield typed(df)
+            return
+        print("Warning: the pyarrow reader is not available (not installed, or csv_sep/csv_quote is not a single character), using the pandas reader.")
+
+    kwargs = {}
+    if options:
+        names = list(pd.read_csv(file_name, sep=separator, quotechar=quote, nrows=0).columns)
+        kwargs = read_csv_kwargs(options, names)
+
+    with open(file_name, mode='r', encoding='utf-8') as file:
+        if not chunk_size:
+            #df = pd.read_csv(file, sep=separator, quotechar=quote, escapechar='\\', engine='python')
+            df = pd.read_csv(file, sep=separator, quotechar=quote, low_memory=False, **kwargs)
+            yield typed(df)
+            return
+
+        with pd.read_csv(file, sep=separator, quotechar=quote, chunksize=chunk_size, low_memory=False, **kwargs) as reader:
+            for df in reader:
+                yield typed(df)
+
+
+def iter_rows(chunks):
+    for df in chunks:
+        yield from df.itertuples(index=False, name=None)
+
+
+def copy_lines(chunks, columns, column_types, vectorized=True):
+    # One text block of COPY lines per chunk
+    for df in chunks:
+        if vectorized:
+            yield clean_chunk_func(df, columns, column_types)
+            continue
+
+        yield ''.join(
+            '\t'.join(escape_copy_value(v) for v in clean_row_func(row, columns, column_types)) + '\n'
+            for row in df.itertuples(index=False, name=None)
+        )
+
+
+class CopyStream:
+    """
+    A read-only file-like object for cursor.copy_expert().
+    It pulls the text (or binary) blocks from an iterator only when the server asks for more data,
+    so only one chunk is kept in the memory and the server starts ingesting while we are still parsing.
+    The text blocks are encoded with the client encoding of the connection (see connection_encoding()),
+    psycopg2 sends the bytes as they are.
+    """
+
+    def __init__(self, blocks, profiler=NO_PROFILER, encoding='utf-8'):
+        self.blocks = iter(blocks)
+        self.encoding = encoding
+        self.buffer = bytearray()
+        self.exhausted = False
+        self.profiler = profiler
+
+    def _fill(self, size):
+        while not self.exhausted and (size < 0 or len(self.buffer) < size):
+            try:
+                block = next(self.blocks)
+                self.buffer += block if isinstance(block, bytes) else block.encode(self.encoding)
+            except StopIteration:
+                self.exhausted = True
+
+    def read(self, size=-1):
+        with self.profiler.stage('buffer'):
+            self._fill(size)
+            if size < 0:
+                size = len(self.buffer)
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+        return data
+
+    def readline(self, size=-1):
+        while not self.exhausted and b'\n' not in self.buffer:
+            self._fill(len(self.buffer) + 1)
+        end = self.buffer.find(b'\n') + 1 or len(self.buffer)
+        if 0 <= size < end:
+            end = size
+        data = bytes(self.buffer[:end])
+        del self.buffer[:end]
+        return data
+
+
+def connection_encoding(conn):
+    # Python codec of the client encoding, e.g. LATIN2 -> iso8859_2
+    return psycopg2.extensions.encodings.get(conn.encoding, 'utf-8')
+
+
+def copy_query(target, copy_format='text'):
+    if copy_format == 'binary':
+        return f"""
+            COPY {target}
+            FROM STDIN
+            WITH (FORMAT binary)
+        """
+
+    return f"""
+        COPY {target}
+        FROM STDIN
+        WITH (FORMAT text, DELIMITER '\t', NULL '\\N')
+    """
+
+
+# =========================================================
+# Binary COPY
+# The PGCOPY binary format: a header, then every row as a 16 bit field count and
+# (32 bit length, value) pairs (length -1 for NULL), and a -1 trailer at the end.
+# The fixed size types are encoded from numpy arrays directly, and all fields are
+# put in their place in the output buffer with numpy indexing, not row by row.
+# =========================================================
+
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+PG_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+
+BINARY_TYPES = {
+    'INTEGER': '>i4',
+    'BIGINT': '>i8',
+    'REAL': '>f4',
+    'DOUBLE PRECISION': '>f8',
+    'DATE': '>i4',
+    'TIMESTAMP WITHOUT TIME ZONE': '>i8',
+    'TIME WITHOUT TIME ZONE': '>i8',
+}
+
+def fixed_field(values, null, dtype):
+    # (length, value) of every row in one structured array, NULL rows without the value bytes
+    n = len(values)
+    width = np.dtype(dtype).itemsize
+    rec = np.zeros(n, dtype=[('len', '>i4'), ('val', dtype)])
+    rec['len'] = np.where(null, -1, width)
+    rec['val'] = np.where(null, 0, values)
+
+    raw = rec.view(np.uint8).reshape(n, 4 + width)
+    keep = np.ones((n, 4 + width), dtype=bool)
+    keep[null, 4:] = False
+    return raw[keep], np.where(null, 4, 4 + width)
+
+def varlen_field(encoded, null):
+    # encoded: bytes values, ignored in the NULL rows
+    parts = [
+        b'\xff\xff\xff\xff' if is_null else struct.pack('>i', len(b)) + b
+        for b, is_null in zip(encoded, null)
+    ]
+    lengths = np.fromiter((len(p) for p in parts), dtype=np.int64, count=len(parts))
+    return np.frombuffer(b''.join(parts), dtype=np.uint8), lengths
+
+def numeric_binary(text):
+    # NUMERIC: int16 ndigits, int16 weight, uint16 sign, int16 dscale, base 10000 digits
+    d = Decimal(text)
+    if d.is_nan():
+        return struct.pack('>hhHh', 0, 0, 0xC000, 0)
+    if d.is_infinite():
+        return struct.pack('>hhHh', 0, 0, 0xF000 if d < 0 else 0xD000, 0)
+
+    sign, digits, exp = d.as_tuple()
+    digits = ''.join(map(str, digits))
+    if exp > 0:
+        digits += '0' * exp
+        exp = 0
+    dscale = -exp
+
+    n_int = len(digits) - dscale
+    if n_int > 0:
+        int_part, frac_part = digits[:n_int], digits[n_int:]
+    else:
+        int_part, frac_part = '0', '0' * -n_int + digits
+
+    int_part = int_part.zfill((len(int_part) + 3) // 4 * 4)
+    frac_part = frac_part.ljust((len(frac_part) + 3) // 4 * 4, '0')
+    groups = [int(int_part[i:i + 4]) for i in range(0, len(int_part), 4)]
+    weight = len(groups) - 1
+    groups += [int(frac_part[i:i + 4]) for i in range(0, len(frac_part), 4)]
+
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    return struct.pack(f'>hhHh{len(groups)}H', len(groups), weight, 0x4000 if sign else 0, dscale, *groups)
+
+# encoding: the client encoding of the connection, the server converts the text fields from it
+def binary_column(series, col_type, encoding='utf-8'):
+    values, null = clean_column_values(series, col_type)
+    dtype = BINARY_TYPES.get(col_type)
+
+    if col_type in ['INTEGER', 'BIGINT']:
+        numbers = values.astype('Int64').to_numpy(dtype='int64', na_value=0)
+        if col_type == 'INTEGER' and ((numbers < -2147483648) | (numbers > 2147483647))[~null].any():
+            raise ValueError(f"integer out of range in column {series.name}")
+        return fixed_field(numbers, null, dtype)
+
+    if col_type in ['REAL', 'DOUBLE PRECISION']:
+        return fixed_field(values.to_numpy(dtype='float64', na_value=0), null, dtype)
+
+    if col_type == 'NUMERIC':
+        text = values.to_numpy().astype(str)
+        return varlen_field([b'' if n else numeric_binary(t) for t, n in zip(text, null)], null)
+
+    if col_type in ['DATE', 'TIMESTAMP WITHOUT TIME ZONE']:
+        if values.dt.tz is not None:
+            values = values.dt.tz_localize(None)
+        if col_type == 'DATE':
+            stamps = np.where(null, PG_EPOCH, values.dt.normalize().to_numpy(dtype='datetime64[us]'))
+            return fixed_field((stamps - PG_EPOCH) // np.timedelta64(1, 'D'), null, dtype)
+        stamps = np.where(null, PG_EPOCH, values.dt.floor('s').to_numpy(dtype='datetime64[us]'))
+        return fixed_field((stamps - PG_EPOCH) // np.timedelta64(1, 'us'), null, dtype)
+
+    if col_type == 'TIME WITHOUT TIME ZONE':
+        parts = values.mask(null).str.split(':', expand=True).reindex(columns=[0, 1, 2])
+        seconds = parts.apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype='int64') @ np.array([3600, 60, 1])
+        return fixed_field(seconds * 1000000, null, dtype)
+
+    # GEOMETRY: the EWKB bytes, the binary input of PostGIS does not read EWKT
+    if is_geometry(col_type):
+        if values[~null].str.fullmatch(HEX_PATTERN).all():
+            return varlen_field([b'' if n else bytes.fromhex(v) for v, n in zip(values, null)], null)
+        raise ValueError(f"not a point geometry in column {series.name}, the binary COPY format sends only hex EWKB, use copy_format text")
+
+    # TEXT: the same replacements as in the text format, but no backslash escaping
+    text = values.str.replace(r'[\t\n\r]', ' ', regex=True).to_numpy(dtype=object)
+    return varlen_field([b'' if n else t.encode(encoding) for t, n in zip(text, null)], null)
+
+def clean_chunk_binary(df, columns, column_types, encoding='utf-8'):
+    # PGCOPY rows of a whole DataFrame
+    if df.empty:
+        return b''
+
+    fields = [binary_column(df.iloc[:, i], column_types.get(col), encoding) for i, col in enumerate(columns)]
+    lengths = np.stack([lens for _, lens in fields], axis=1)
+    row_len = 2 + lengths.sum(axis=1)
+    row_start = np.concatenate(([0], np.cumsum(row_len)[:-1]))
+
+    out = np.empty(int(row_len.sum()), dtype=np.uint8)
+    field_count = np.frombuffer(struct.pack('>h', len(columns)), dtype=np.uint8)
+    out[row_start] = field_count[0]
+    out[row_start + 1] = field_count[1]
+
+    field_start = row_start + 2
+    for data, lens in fields:
+        # output position of every byte of this column
+        src_start = np.concatenate(([0], np.cumsum(lens)[:-1]))
+        out[np.repeat(field_start - src_start, lens) + np.arange(len(data))] = data
+        field_start = field_start + lens
+
+    return out.tobytes()
+
+def copy_binary_blocks(chunks, columns, column_types, encoding='utf-8'):
+    yield PGCOPY_HEADER
+    for df in chunks:
+        yield clean_chunk_binary(df, columns, column_types, encoding)
+    yield PGCOPY_TRAILER
+
+
+# DB Connect
+# Session parameters of the bulk profile, bulk_settings of the config overrides them
+BULK_SETTINGS = {
+    'synchronous_commit': 'off',
+    'maintenance_work_mem': '1GB',
+    'work_mem': '256MB',
+}
+
+def bulk_settings(config):
+    if not config.get('bulk_profile', False):
+        return {}
+    return {**BULK_SETTINGS, **config.get('bulk_settings', {})}
+
+def connect_db(config):
+    try:
+        conn = psycopg2.connect(
+            host=config['dbhost'],
+            database=config['dbname'],
+            port=config.get('dbport',5432),
+            user=config['dbuser'],
+            password=config['dbpass']
+        )
+
+    except psycopg2.OperationalError as e:
+        if "does not exist" in str(e):
+            print(f"Error: The '{config['dbname']}' database does not exists. Try gisdata")
+        else:
+            print("Error: Unsuccesful connect to the PostgreSQL database.")
+            print(f"Host: {config['dbhost']}")
+            print(f"Database: {config['dbname']}")
+            print("Check the host name, database name, the connection parameters, and whether the server is running.")
+        sys.exit(1)
+
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+
+    # Session parameters, also in the parallel workers
+    settings = bulk_settings(config)
+    if settings:
+        cur = conn.cursor()
+        for name, value in settings.items():
+            cur.execute("SELECT set_config(%s, %s, false);", (name, str(value)))
+        cur.close()
+
+    return conn
+
+
+# Processing one csv file
+# conn: an already opened connection (it is not closed here), otherwise a new one is opened for this file
+# confirm_delete: the answer for the delete_data question, if None it is asked interactively
+# Returns a small summary dict of the import
+def process_csv(file_name, config, db_table_name=None, db_table_comment=None, conn=None, confirm_delete=None, show_progress=True):
+
+    start_time = time.perf_counter()
+
+    separator = config.get('csv_sep', ',')
+    quote = config.get('csv_quote', '"')
+    dry_run = config.get('dry_run', True)
+    output = config.get('output', 'postgres')
+    import_data = not dry_run and output == 'postgres'
+    insert_rows = config.get('insert_rows', True)
+    create_table = config.get('create_table', True)
+    delete_data = config.get('delete_data', False)
+    encoding = config.get('character_encoding', 'utf8')
+    sample_size = config.get('sample_size', 4000)
+    row_error_check = config.get('row_error_check', False)
+    sql_copy_no = config.get('sql_copy_no', False)
+    chunk_size = config.get('chunk_size', 0)
+    vectorized_cleaning = config.get('vectorized_cleaning', True)
+    parallel_copy = config.get('parallel_copy', 0)
+    staging_table = config.get('staging_table', False)
+    typed_parsing = config.get('typed_parsing', True)
+    csv_reader = config.get('reader', 'pandas')
+    copy_format = config.get('copy_format', 'text')
+    bisect_errors = config.get('bisect_errors', False)
+    copy_batch_size = config.get('copy_batch_size', 10000)
+    reject_file = config.get('reject_file', '')
+    dry_run_output = config.get('dry_run_output', '')
+    dry_run_format = config.get('dry_run_format', 'insert')
+    dry_run_batch_size = config.get('dry_run_batch_size', 1000)
+    merge_key = config.get('merge_key', [])
+    if isinstance(merge_key, str):
+        merge_key = [k.strip() for k in merge_key.split(',') if k.strip()]
+    merge_delete_missing = config.get('merge_delete_missing', False)
+    change_hash = config.get('change_hash', False)
+    indexes = config.get('indexes', [])
+    drop_indexes = config.get('drop_indexes', False)
+    geometry = config.get('geometry', False)
+    geometry_srid_default = config.get('geometry_srid', 4326)
+    geometry_column = config.get('geometry_column', 'obm_geometry')
+    bulk_profile = config.get('bulk_profile', False)
+    unlogged_table = config.get('unlogged_table')
+    if unlogged_table is None:
+        unlogged_table = bulk_profile
+    analyze = config.get('analyze')
+    if analyze is None:
+        analyze = bulk_profile
+    profile = config.get('profile', False)
+    profiler = Profiler() if profile else NO_PROFILER
+
+    type_cache = TypeCache(config['type_cache'], config.get('type_cache_size', 200)) if config.get('type_cache') else None
+    cached = None
+    if type_cache:
+        fingerprint = file_fingerprint(file_name, separator, quote, sample_size, f'geometry={geometry}:{geometry_srid_default}')
+        if config.get('type_cache_refresh', False):
+            type_cache.invalidate(file_name)
+        else:
+            with profiler.stage('type cache'):
+                cached = type_cache.get(fingerprint)
+
+    if cached:
+        print("Column types from the type cache")
+        encoding, total_rows, column_types = cached
+        columns = list(column_types)
+        sample_df = None
+    else:
+        # Character encoding, number of rows and the sample data in one scan
+        print("Sampling data for type detection...")
+        encoding, total_rows, sample_df = scan_file(file_name, separator, quote, sample_size, profiler)
+
+        # Field name normalization based on the sample data
+        sample_df = normalize_column_names(sample_df)
+        columns = list(sample_df.columns)
+
+        # Field/Column type assign
+        print("Detecting column types...")
+        with profiler.stage('inference'):
+            column_types = detect_column_types(sample_df, columns)
+            if geometry:
+                column_types = detect_geometry_columns(sample_df, columns, column_types, geometry_srid_default)
+
+        if type_cache:
+            type_cache.put(fingerprint, file_name, encoding, total_rows, column_types)
+
+    if type_cache:
+        type_cache.close()
+
+    # pandas dtypes from the column types
+    # With a cached type list the first rows of the file are enough for the date formats and categories
+    options = None
+    if typed_parsing:
+        with profiler.stage('read options'):
+            if sample_df is None:
+                sample_df = normalize_column_names(pd.read_csv(file_name, sep=separator, quotechar=quote, nrows=3000, low_memory=False))
+            options = read_options(columns, column_types, sample_df)
+
+    # Reading input file
+    # Without chunk_size this is the whole file in one DataFrame
+    chunks = profiler.iterate('parse', read_chunks(file_name, separator, quote, chunk_size, options, columns, column_types, csv_reader))
+
+    # A point column from the latitude/longitude columns, if the file has no geometry column
+    point = None
+    if geometry and not any(is_geometry(t) for t in column_types.values()):
+        latlon = find_latlon_columns(columns, column_types, config.get('latlon_columns'))
+        if latlon and geometry_column in columns:
+            print(f"Warning: {geometry_column} is in the file but it is not a geometry, no point column is made from {latlon[0]}, {latlon[1]}")
+        elif latlon:
+            point = (latlon[0], latlon[1], geometry_column, geometry_srid_default)
+            print(f"  {geometry_column}: geometry(Point,{geometry_srid_default}) from {latlon[0]}, {latlon[1]}")
+            chunks = profiler.iterate('geometry', add_point_column(chunks, *point))
+            columns = columns + [geometry_column]
+            column_types = {**column_types, geometry_column: f'geometry(Point,{geometry_srid_default})'}
+
+    if output not in ['postgres', 'csv', 'parquet']:
+        print(f"Error: unknown output: {output}")
+        return {'file': file_name, 'table': None, 'rows': 0, 'seconds': time.perf_counter() - start_time, 'status': 'failed'}
+
+    # The binary input of PostGIS reads only EWKB, the text format is used for the other geometries
+    if copy_format == 'binary' and any(is_geometry(t) and not t.startswith('geometry(Point') for t in column_types.values()):
+        print("Warning: the binary COPY format sends only point geometries, using copy_format text.")
+        copy_format = 'text'
+
+    # The bisection splits the COPY text lines, the bad rows are found and rejected line by line
+    if copy_format == 'binary' and bisect_errors:
+        print("Warning: bisect_errors copies the rows in the text format, copy_format binary is not used.")
+        copy_format = 'text'
+
+    # Creating table name from the file name
+    base_name = os.path.splitext(os.path.basename(file_name))[0]
+    table_name = db_table_name if db_table_name else ('t' + base_name if base_name[0].isdigit() else base_name)
+    schema_name = config['db_schema_name'] if config['db_schema_name'] else 'public'
+    target = f'{schema_name}.{table_name}'
+
+    missing_key = [k for k in merge_key if k not in columns]
+    if missing_key:
+        print(f"Error: merge_key column not found in the file: {', '.join(missing_key)}")
+        return {
+            'file': file_name,
+            'table': target,
+            'rows': 0,
+            'seconds': time.perf_counter() - start_time,
+            'status': 'failed'
+        }
+
+    # With merge_key the rows are loaded into a temporary table first
+    staging_merge = f'{table_name}_merge'
+    copy_target = staging_merge if merge_key else target
+
+    # DB Connect, and cursor
+    # The dry run does not need the database
+    own_conn = conn is None and import_data
+    if own_conn:
+        conn = connect_db(config)
+    cur = conn.cursor() if conn is not None else None
+
+    if cur is not None and bulk_profile:
+        print("Bulk profile: " + ', '.join(f'{name}={value}' for name, value in bulk_settings(config).items()))
+
+    columns_with_types = ',\n'.join([f'"{col}" {column_types[col]}' for col in columns])
+    create_table_query = f'CREATE {"UNLOGGED " if unlogged_table else ""}TABLE {schema_name}.{table_name} (\n{columns_with_types});'
+    delete_data_query = f'DELETE FROM {schema_name}.{table_name};'
+
+    comment_query = ''
+    if db_table_comment:
+        safe_comment = db_table_comment.replace("'", "''")
+        comment_query = f"\nCOMMENT ON TABLE {schema_name}.{table_name} IS '{safe_comment}';"
+        create_table_query += comment_query
+
+    status = 'dry_run'
+    merge_counts = None
+    timer = StepTimer()
+    dropped_indexes = []
+
+    if merge_key and delete_data:
+        print("Warning: delete_data is not used with merge_key, the missing rows can be deleted with merge_delete_missing.")
+        delete_data = False
+
+    if change_hash and not merge_key:
+        print("Warning: change_hash needs merge_key, it is not used.")
+        change_hash = False
+
+    if import_data and insert_rows and parallel_copy > 1 and not row_error_check and not sql_copy_no and not bisect_errors and not merge_key:
+        # =========================================================
+        # PARALLEL COPY MODE
+        # =========================================================
+        print(f"PARALLEL COPY MODE ({parallel_copy} processes)")
+
+        staging = f'{schema_name}.{table_name}_staging'
 
-            # biztosítjuk, hogy létezzen
-            use_batch_mode = 'sql_copy_no' in locals() and sql_copy_no
+        try:
+            if delete_data and confirm_delete is None:
+                print("Do you want to truncate the destination table?")
+                print(f"   `{delete_data_query}`")
+                answer = input("yes/no: ").strip().lower()
+                confirm_delete = answer == 'yes'
+
+            if staging_table:
+                # The workers load into an UNLOGGED table, which is swapped in at the end in one transaction
+                cur.execute(f'DROP TABLE IF EXISTS {staging};')
+                cur.execute(f'CREATE UNLOGGED TABLE {staging} (\n{columns_with_types});')
+                copy_target = staging
+            else:
+                # The workers use their own connections, so the table has to be committed before them
+                print("Warning: without staging_table the rows of the successful workers stay in the table if an other worker fails.")
+                if drop_indexes:
+                    print("Warning: drop_indexes is used only with staging_table in parallel_copy.")
+                if create_table:
+                    cur.execute(create_table_query)
+                if delete_data and confirm_delete:
+                    cur.execute(delete_data_query)
+                copy_target = target
+            timer.lap('prepare')
+
+            with profiler.stage('parallel copy'):
+                copied = parallel_copy_csv(file_name, {**config, 'copy_format': copy_format}, columns, column_types, copy_target, parallel_copy, options, point)
+            profiler.count_rows('parallel copy', copied)
+            timer.lap('load')
+
+            cur.execute("BEGIN;")
+            if staging_table:
+                if create_table:
+                    cur.execute(f'ALTER TABLE {staging} SET LOGGED;')
+                    cur.execute(f'ALTER TABLE {staging} RENAME TO {table_name};')
+                    if comment_query:
+                        cur.execute(comment_query)
+                else:
+                    if delete_data and confirm_delete:
+                        cur.execute(delete_data_query)
+                    if drop_indexes:
+                        dropped_indexes = drop_table_indexes(cur, target)
+                        timer.lap('drop indexes')
+                    cur.execute(f'INSERT INTO {target} SELECT * FROM {staging};')
+                    cur.execute(f'DROP TABLE {staging};')
+                timer.lap('swap')
+
+            create_indexes(cur, dropped_indexes + index_queries(schema_name, table_name, indexes), timer)
+            if create_table and unlogged_table and not staging_table:
+                cur.execute(f'ALTER TABLE {target} SET LOGGED;')
+                timer.lap('set logged')
+            cur.execute("COMMIT;")
+            timer.lap('commit')
+
+            if analyze:
+                cur.execute(f'ANALYZE {target};')
+                timer.lap('analyze')
+
+            print(f"Done, {copied} rows")
+            status = 'ok'
+
+        except Exception as e:
+            print(f"Error occurred during database operation: {e}")
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                cur.execute("ROLLBACK;")
+            if staging_table:
+                cur.execute(f'DROP TABLE IF EXISTS {staging};')
+            status = 'failed'
+
+    elif import_data:
+        try:
+            if delete_data and confirm_delete is None:
+                print("Do you want to truncate the destination table?")
+                print(f"   `{delete_data_query}`")
+                answer = input("yes/no: ").strip().lower()
+                confirm_delete = answer == 'yes'
+
+            # Begin a transaction
+            timer = StepTimer()
+            cur.execute("BEGIN;")
+
+            if create_table:
+                cur.execute(create_table_query)
+
+            # The indexes are dropped in the transaction, a failed import gets them back with the rollback
+            if drop_indexes and not create_table:
+                dropped_indexes = drop_table_indexes(cur, target, merge_key)
+                timer.lap('drop indexes')
+
+            if merge_key:
+                if not has_unique_index(cur, target, merge_key):
+                    cur.execute(merge_index_query(schema_name, table_name, merge_key))
+                cur.execute(merge_staging_query(staging_merge, target))
+
+            # Only the new and the changed rows are sent
+            change_filter = None
+            rejected_rows = []
+            if change_hash:
+                change_filter = ChangeFilter(cur, schema_name, table_name, columns, column_types, merge_key, reset=create_table)
+                chunks = profiler.iterate('change detection', change_filter.filter(chunks))
+
+            if delete_data and confirm_delete:
+                cur.execute(delete_data_query)
+            timer.lap('prepare')
+
+            # Import data
+            if insert_rows:
+
+                print("Preparing data...")
+
+                use_batch_mode = sql_copy_no
+
+                # =========================================================
+                # BISECT MODE
+                # =========================================================
+                if bisect_errors:
+                    print("BISECT MODE")
+
+                    if not reject_file:
+                        reject_file = os.path.splitext(file_name)[0] + '_rejects.csv'
+
+                    with profiler.stage('bisect copy'):
+                        copied, rejected = copy_with_bisect(
+                            cur, copy_target, chunks, columns, column_types,
+                            copy_batch_size, reject_file, total_rows, show_progress, rejected_rows
+                        )
+                    profiler.count_rows('bisect copy', copied + rejected)
+
+                    print(f"{copied} rows loaded, {rejected} rows rejected")
+                    if rejected:
+                        print(f"The rejected rows and the error messages: {reject_file}")
+
+                # =========================================================
+                # SAFE MODE
+                # =========================================================
+                elif row_error_check:
+                    print("SAFE MODE")
+
+                    insert_query = f"""
+                        INSERT INTO {copy_target}
+                        VALUES ({', '.join(['%s'] * len(columns))})
+                    """
+
+                    for index, row in tqdm(
+                        enumerate(iter_rows(chunks)),
+                        total=total_rows,
+                        desc="Inserting rows",
+                        disable=not show_progress
+                    ):
+                        with profiler.stage('clean'):
+                            clean_row = clean_row_func(row, columns, column_types)
+
+                        try:
+                            with profiler.stage('insert'):
+                                cur.execute(insert_query, clean_row)
+                        except Exception as e:
+                            print(f"\nError on row {index + 1}: {e}")
+                            raise
+
+                # =========================================================
+                # BATCH MODE
+                # =========================================================
+                elif use_batch_mode:
+                    print("BATCH MODE")
+
+                    insert_query = f"""
+                        INSERT INTO {copy_target}
+                        VALUES %s
+                    """
+
+                    progress = tqdm(total=total_rows, desc="Inserting rows", disable=not show_progress)
+
+                    for df in chunks:
+                        with profiler.stage('clean', len(df)):
+                            rows = [
+                                clean_row_func(row, columns, column_types)
+                                for row in df.itertuples(index=False, name=None)
+                            ]
+
+                        try:
+                            with profiler.stage('insert', len(rows)):
+                                execute_values(cur, insert_query, rows, page_size=10000)
+                        except Exception as e:
+                            print(f"Error occurred: {e}")
+                            raise
+
+                        progress.update(len(rows))
+
+                    progress.close()
+
+                # =========================================================
+                # COPY MODE
+                # =========================================================
+                else:
+                    print("COPY MODE")
 
-            # =========================================================
-            # SAFE MODE
-            # =========================================================
-            if row_error_check:
-                print("SAFE MODE")
+                    progress = tqdm(total=total_rows, desc="Copying rows", disable=not show_progress)
 
-                insert_query = f"""
-                    INSERT INTO {schema_name}.{table_name}
-                    VALUES ({', '.join(['%s'] * len(df.columns))})
-                """
+                    def counted(chunks):
+                        for df in chunks:
+                            yield df
+                            progress.update(len(df))
 
-                for index, row in tqdm(
-                    enumerate(df.itertuples(index=False, name=None)),
-                    total=len(df),
-                    desc="Inserting rows"
-                ):
-                    clean_row = clean_row_func(row)
+                    # Without chunk_size this is one block for the whole file,
+                    # otherwise the chunks are cleaned while the server reads the stream
+                    if copy_format == 'binary':
+                        blocks = copy_binary_blocks(counted(chunks), columns, column_types, connection_encoding(conn))
+                    else:
+                        blocks = copy_lines(counted(chunks), columns, column_types, vectorized_cleaning)
+                    buffer = CopyStream(profiler.iterate('clean', blocks), profiler, connection_encoding(conn))
 
                     try:
-                        cur.execute(insert_query, clean_row)
+                        with profiler.stage('copy'):
+                            cur.copy_expert(copy_query(copy_target, copy_format), buffer)
+                        # The text blocks do not show the rows, all of them went through the cleaning, the buffer and the COPY
+                        for stage in ('clean', 'buffer', 'copy'):
+                            profiler.count_rows(stage, progress.n)
                     except Exception as e:
-                        print(f"\nError on row {index + 1}: {e}")
+                        print(f"COPY failed: {e}")
                         raise
+                    finally:
+                        progress.close()
+
+                timer.lap('load')
+
+                # =========================================================
+                # MERGE
+                # =========================================================
+                if merge_key:
+                    print("Merging into the target table...")
+                    # After the first import with change_hash the unchanged rows are not in the staging table,
+                    # the missing rows are found by the stored keys
+                    delete_by_hash = merge_delete_missing and change_filter is not None and change_filter.has_previous
+                    with profiler.stage('merge'):
+                        merge_counts = apply_merge(cur, target, staging_merge, columns, merge_key, merge_delete_missing and not delete_by_hash)
+
+                    if change_filter:
+                        if delete_by_hash:
+                            merge_counts['deleted'] = change_filter.delete_missing(cur, target)
+                        change_filter.save(cur, rejected_rows)
+                        merge_counts['unchanged'] += change_filter.unchanged
+                        merge_counts['not_sent'] = change_filter.unchanged
+
+                    print_merge_counts(merge_counts)
+                    timer.lap('merge')
+
+            create_indexes(cur, dropped_indexes + index_queries(schema_name, table_name, indexes), timer)
+
+            # The table is written into the WAL once, at the end
+            if create_table and unlogged_table:
+                cur.execute(f'ALTER TABLE {target} SET LOGGED;')
+                timer.lap('set logged')
+
+            cur.execute("COMMIT;")
+            timer.lap('commit')
+
+            if analyze and insert_rows:
+                cur.execute(f'ANALYZE {target};')
+                timer.lap('analyze')
+            print("Done")
+            status = 'ok'
+
+        except Exception as e:
+            print(f"Error occurred during database operation: {e}")
+            cur.execute("ROLLBACK;")
+            print("Transaction rolled back due to error.")
+            status = 'failed'
+
+    elif output != 'postgres':
+        # Cleaned data files instead of the database, e.g. for loading later
+        path = output_path(output, config.get('output_path', ''), file_name, table_name)
+        sink = output_sink(output, path, columns, column_types, config)
+        progress = tqdm(total=total_rows, desc=f"Writing {output}", disable=not show_progress)
+        try:
+            for df in chunks:
+                with profiler.stage('clean', len(df)):
+                    cleaned = clean_frame(df, columns, column_types)
+                with profiler.stage('write', len(df)):
+                    sink.write(cleaned)
+                progress.update(len(df))
+            status = 'ok'
+        except Exception as e:
+            print(f"Error occurred during writing {path}: {e}")
+            status = 'failed'
+        finally:
+            sink.close()
+            progress.close()
+        print(f"Output: {path}")
 
-            # =========================================================
-            # BATCH MODE
-            # =========================================================
-            elif use_batch_mode:
-                print("BATCH MODE")
-
-                rows = [
-                    clean_row_func(row)
-                    for row in tqdm(
-                        df.itertuples(index=False, name=None),
-                        total=len(df),
-                        desc="Preparing rows"
-                    )
-                ]
-
-                insert_query = f"""
-                    INSERT INTO {schema_name}.{table_name}
-                    VALUES %s
-                """
+    else:
+        # A DEBUG option: writing the SQL commands instead of SQL operations, without database connection
+        if dry_run_output:
+            output_file = dry_run_output_file(dry_run_output, table_name)
+            out = open(output_file, 'w', encoding='utf-8', buffering=DRY_RUN_BUFFER_SIZE)
+        else:
+            sys.stdout.flush()
+            out = sys.stdout
 
-                try:
-                    execute_values(cur, insert_query, rows, page_size=10000)
-                except Exception as e:
-                    print(f"Error occurred: {e}")
-                    raise
+        try:
+            out.write("BEGIN;\n")
+
+            # Print create table
+            if create_table:
+                out.write(create_table_query + '\n')
+
+            if merge_key:
+                out.write(merge_index_query(schema_name, table_name, merge_key) + '\n')
+                out.write(merge_staging_query(staging_merge, target) + '\n')
+
+            if delete_data:
+                out.write(delete_data_query + '\n')
+
+            # Print data
+            if insert_rows:
+                progress = tqdm(total=total_rows, desc="Writing SQL", disable=not (show_progress and dry_run_output))
+
+                def counted(chunks):
+                    for df in chunks:
+                        yield df
+                        progress.update(len(df))
+
+                blocks = dry_run_blocks(counted(chunks), columns, column_types, copy_target, dry_run_format, dry_run_batch_size)
+                for block in profiler.iterate('sql', blocks):
+                    with profiler.stage('write'):
+                        out.write(block)
+                profiler.count_rows('sql', progress.n)
 
-            # =========================================================
-            # COPY MODE
-            # =========================================================
+                progress.close()
+
+                if merge_key:
+                    out.write(merge_query(target, staging_merge, columns, merge_key) + ';\n')
+                    if merge_delete_missing:
+                        out.write(merge_delete_query(target, staging_merge, merge_key) + ';\n')
+
+            for name, query in index_queries(schema_name, table_name, indexes):
+                out.write(query + '\n')
+
+            if create_table and unlogged_table:
+                out.write(f'ALTER TABLE {target} SET LOGGED;\n')
+
+            out.write("COMMIT;\n")
+
+            if analyze and insert_rows:
+                out.write(f'ANALYZE {target};\n')
+        finally:
+            if dry_run_output:
+                out.close()
+                print(f"SQL script: {output_file}")
             else:
-                print("COPY MODE")
+                out.flush()
+
+    # Close DB
+    if cur is not None:
+        cur.close()
+    if own_conn:
+        conn.close()
+
+    result = {
+        'file': file_name,
+        'table': target if output == 'postgres' else path,
+        'rows': total_rows,
+        'seconds': time.perf_counter() - start_time,
+        'status': status
+    }
+    if merge_counts:
+        result.update(merge_counts)
+    if timer.steps:
+        timer.report()
+        result['timings'] = dict(timer.steps)
+
+    if profile:
+        write_profile(profile, file_name, {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'version': VERSION,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'pyarrow': pyarrow.__version__ if pyarrow else None,
+            'file': os.path.abspath(file_name),
+            'file_mb': round(os.path.getsize(file_name) / 1024 ** 2, 2),
+            'table': target,
+            'rows': total_rows,
+            'status': status,
+            'seconds': round(result['seconds'], 4),
+            'rows_per_s': round(total_rows / result['seconds']) if result['seconds'] else None,
+            'peak_rss_mb': round_mb(peak_rss_mb()),
+            'peak_rss_children_mb': round_mb(peak_rss_mb(children=True)),
+            # copy_format: the one really used, it can fall back to text
+            'options': {**{key: config.get(key) for key in PROFILE_OPTIONS if key in config}, 'copy_format': copy_format},
+            'stages': profiler.report(),
+            'steps': result.get('timings', {}),
+        })
+    return result
+
+
+# =========================================================
+# Bisecting COPY
+# The rows are copied in batches, each batch in a savepoint. If a batch fails, it is split
+# into halves recursively until the bad rows are found. These are written into the reject
+# file with the error message, and all the other rows are loaded.
+# =========================================================
+
+def copy_bisect(cur, target, lines, positions, on_reject):
+    cur.execute("SAVEPOINT csv_proc_batch;")
+    try:
+        cur.copy_expert(copy_query(target), io.StringIO(''.join(lines)))
+        cur.execute("RELEASE SAVEPOINT csv_proc_batch;")
+        return len(lines)
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT csv_proc_batch;")
+        cur.execute("RELEASE SAVEPOINT csv_proc_batch;")
+        if len(lines) == 1:
+            on_reject(positions[0], e)
+            return 0
+
+    mid = len(lines) // 2
+    return (
+        copy_bisect(cur, target, lines[:mid], positions[:mid], on_reject)
+        + copy_bisect(cur, target, lines[mid:], positions[mid:], on_reject)
+    )
 
-                buffer = io.StringIO()
+def reject_value(value):
+    if pd.isna(value):
+        return ''
+    # the dates are parsed by read_csv, write them back without the time part
+    if isinstance(value, pd.Timestamp) and value == value.normalize():
+        return value.strftime('%Y-%m-%d')
+    return value
+
+# rejected_rows: if a list is given, the file row numbers (index) of the rejected rows are added to it
+def copy_with_bisect(cur, target, chunks, columns, column_types, batch_size, reject_file, total_rows=None, show_progress=True, rejected_rows=None):
+    copied = 0
+    rejected = 0
+
+    with open(reject_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['csv_row', 'error'] + columns)
+
+        progress = tqdm(total=total_rows, desc="Copying rows", disable=not show_progress)
+
+        for df in chunks:
+
+            def on_reject(pos, e):
+                nonlocal rejected
+                rejected += 1
+                error = ' | '.join(line.strip() for line in str(e).strip().splitlines())
+                writer.writerow([df.index[pos] + 2, error] + [reject_value(v) for v in df.iloc[pos]])
+                if rejected_rows is not None:
+                    rejected_rows.append(df.index[pos])
+
+            for start in range(0, len(df), batch_size):
+                batch = df.iloc[start:start + batch_size]
+                # one COPY line per row, the line breaks in the values are already replaced
+                lines = [line + '\n' for line in clean_chunk_func(batch, columns, column_types).split('\n')[:-1]]
+                copied += copy_bisect(cur, target, lines, list(range(start, start + len(batch))), on_reject)
+                progress.update(len(batch))
+
+        progress.close()
+
+    if not rejected:
+        os.remove(reject_file)
+
+    return copied, rejected
+
+
+# =========================================================
+# Timings
+# The wall time of the import steps, each lap is the time since the previous one
+# =========================================================
+
+class StepTimer:
+    def __init__(self):
+        self.steps = []
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.steps.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        print("Timings:")
+        for name, seconds in self.steps:
+            print(f"  {name:<32} {seconds:9.2f} s")
+
+
+# =========================================================
+# Indexes
+# The declared indexes are created after the load, so COPY does not have to maintain them row by row
+# =========================================================
+
+def index_queries(schema_name, table_name, indexes):
+    queries = []
+    for index in indexes:
+        if isinstance(index, str):
+            index = {'columns': [index]}
+        columns = index['columns'] if isinstance(index['columns'], list) else [index['columns']]
+        method = index.get('method', 'btree').lower()
+        name = index.get('name') or f"{table_name}_{'_'.join(columns)}_{method}_idx"
+        unique = 'UNIQUE ' if index.get('unique', False) else ''
+        queries.append((name, f'CREATE {unique}INDEX IF NOT EXISTS {name} ON {schema_name}.{table_name} USING {method} ({quote_columns(columns)});'))
+    return queries
+
+def drop_table_indexes(cur, target, keep_key=None):
+    # The indexes behind constraints can't be dropped alone, and the unique index of merge_key is needed by ON CONFLICT
+    cur.execute("""
+        SELECT n.nspname, c.relname, pg_get_indexdef(i.indexrelid), i.indisunique,
+               ARRAY(
+                   SELECT a.attname::text FROM pg_attribute a
+                   WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+                   ORDER BY a.attname::text
+               )
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE i.indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)
+    """, (target,))
+
+    dropped = []
+    for schema_name, name, definition, unique, columns in cur.fetchall():
+        if keep_key and unique and columns == sorted(keep_key):
+            continue
+        cur.execute(f'DROP INDEX "{schema_name}"."{name}";')
+        dropped.append((name, definition + ';'))
+
+    if dropped:
+        print(f"Dropped indexes: {', '.join(name for name, _ in dropped)}")
+    return dropped
+
+def create_indexes(cur, queries, timer):
+    for name, query in queries:
+        print(f"Creating index {name}...")
+        cur.execute(query)
+        timer.lap(f'index {name}')
+
+
+# =========================================================
+# Merge (upsert)
+# The rows are loaded into a temporary table, and only the new and the changed rows are written into
+# the target table with INSERT ... ON CONFLICT DO UPDATE on merge_key, so the unchanged rows are not rewritten.
+# ON CONFLICT needs a unique index on the key columns, it is created if the table has none.
+# =========================================================
+
+def quote_columns(columns, prefix=''):
+    return ', '.join(f'{prefix}"{col}"' for col in columns)
+
+def has_unique_index(cur, target, key):
+    cur.execute("""
+        SELECT 1
+        FROM pg_index i
+        WHERE i.indrelid = %s::regclass
+          AND i.indisunique AND i.indpred IS NULL AND i.indexprs IS NULL
+          AND (
+              SELECT array_agg(a.attname::text ORDER BY a.attname::text)
+              FROM pg_attribute a
+              WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+          ) = %s
+    """, (target, sorted(key)))
+    return cur.fetchone() is not None
+
+def merge_index_query(schema_name, table_name, key):
+    return f'CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_merge_key ON {schema_name}.{table_name} ({quote_columns(key)});'
+
+def merge_staging_query(staging, target):
+    # The same column types and checks as the target table, so the rows are loaded (and rejected) the same way as without merge
+    return f'CREATE TEMP TABLE {staging} (LIKE {target} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) ON COMMIT DROP;'
+
+def merge_query(target, staging, columns, key):
+    key_columns = quote_columns(key)
+    not_null = ' AND '.join(f'"{k}" IS NOT NULL' for k in key)
+    value_columns = [col for col in columns if col not in key]
+
+    # The rows without key are skipped, and if a key is in the file more than once, the last row is used
+    # (the ctid order of the new staging table is the order of the file)
+    query = f"""
+        INSERT INTO {target} AS t ({quote_columns(columns)})
+        SELECT DISTINCT ON ({key_columns}) {quote_columns(columns)}
+        FROM {staging}
+        WHERE {not_null}
+        ORDER BY {key_columns}, ctid DESC
+        ON CONFLICT ({key_columns}) """
+
+    if not value_columns:
+        return query + 'DO NOTHING'
+
+    updates = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in value_columns)
+    return query + f"""DO UPDATE SET {updates}
+        WHERE ({quote_columns(value_columns, 't.')}) IS DISTINCT FROM ({quote_columns(value_columns, 'EXCLUDED.')})"""
+
+def merge_delete_query(target, staging, key):
+    same_key = ' AND '.join(f's."{k}" = t."{k}"' for k in key)
+    return f"""
+        DELETE FROM {target} t
+        WHERE NOT EXISTS (SELECT 1 FROM {staging} s WHERE {same_key})"""
+
+def apply_merge(cur, target, staging, columns, key, delete_missing=False):
+    cur.execute(f'ANALYZE {staging};')
+
+    key_row = f'({quote_columns(key)})'
+    not_null = ' AND '.join(f'"{k}" IS NOT NULL' for k in key)
+    cur.execute(f'SELECT count(*), count(*) FILTER (WHERE NOT ({not_null})), count(DISTINCT {key_row}) FILTER (WHERE {not_null}) FROM {staging};')
+    rows, no_key, keys = cur.fetchone()
+
+    # xmax is 0 for the inserted rows, and the id of this transaction for the updated ones
+    cur.execute(f"""
+        WITH merged AS (
+            {merge_query(target, staging, columns, key)}
+            RETURNING (t.xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged;
+    """)
+    inserted, updated = cur.fetchone()
+
+    deleted = 0
+    if delete_missing:
+        cur.execute(merge_delete_query(target, staging, key))
+        deleted = cur.rowcount
+
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'unchanged': keys - inserted - updated,
+        'deleted': deleted,
+        'duplicate_keys': rows - no_key - keys,
+        'no_key': no_key
+    }
+
+def print_merge_counts(counts):
+    print(f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged, {counts['deleted']} deleted rows")
+    if counts.get('not_sent'):
+        print(f"{counts['not_sent']} unchanged rows were not sent to the server (change_hash)")
+    if counts['duplicate_keys']:
+        print(f"Warning: {counts['duplicate_keys']} rows skipped, their key is in the file more than once (the last one is used)")
+    if counts['no_key']:
+        print(f"Warning: {counts['no_key']} rows skipped, their key is empty")
+
+
+# =========================================================
+# Change detection
+# A hash of every cleaned row (its COPY line) is stored by key in the <table>_row_hash table.
+# On the next import only the rows with a new key or a different hash are sent to the server,
+# the unchanged rows are dropped already on the client side. The stored key is the COPY text
+# of the merge_key columns, so it can be COPY-ed back into typed key columns.
+# The hashes know only about the changes made by csv_proc.py.
+# =========================================================
+
+def copy_field_escape(text):
+    # A text value as one field of a COPY text line
+    return text.str.replace('\\', '\\\\', regex=False).str.replace('\t', '\\t', regex=False)
+
+class ChangeFilter:
+    # reset: the target table is new, the hashes of an earlier table with the same name are dropped
+    def __init__(self, cur, schema_name, table_name, columns, column_types, key, reset=False):
+        self.hash_table = f'{schema_name}.{table_name}_row_hash'
+        self.temp_prefix = f'{table_name}_row_hash'
+        self.columns = columns
+        self.column_types = column_types
+        self.key = key
+        self.key_positions = [columns.index(k) for k in key]
+
+        cur.execute(f'CREATE TABLE IF NOT EXISTS {self.hash_table} (row_key TEXT PRIMARY KEY, row_hash BIGINT NOT NULL);')
+        if not reset:
+            # Rows deleted outside of csv_proc (e.g. truncated or rebuilt table): the stored hashes are not valid
+            cur.execute(f'SELECT (SELECT count(*) FROM {schema_name}.{table_name}), (SELECT count(*) FROM {self.hash_table});')
+            target_rows, hash_rows = cur.fetchone()
+            if target_rows < hash_rows:
+                print(f"Warning: {schema_name}.{table_name} has fewer rows ({target_rows}) than {self.hash_table} ({hash_rows}), "
+                      "it was changed outside of csv_proc, all rows are sent.")
+                reset = True
+        if reset:
+            cur.execute(f'TRUNCATE {self.hash_table};')
+        cur.execute(f'SELECT row_key, row_hash FROM {self.hash_table};')
+        rows = cur.fetchall()
+        self.known_keys = pd.Index([k for k, _ in rows], dtype=object)
+        self.known_hashes = np.array([h for _, h in rows], dtype='int64')
+
+        self.seen_keys = []
+        self.sent = []
+        self.unchanged = 0
+
+    @property
+    def has_previous(self):
+        return len(self.known_keys) > 0
+
+    def row_hashes(self, df):
+        cleaned = [
+            pd.Series(clean_column(df.iloc[:, i], self.column_types.get(col)), dtype=object)
+            for i, col in enumerate(self.columns)
+        ]
+        lines = cleaned[0].str.cat(cleaned[1:], sep='\t') if len(cleaned) > 1 else cleaned[0]
+        hashes = pd.util.hash_array(lines.to_numpy(dtype=object)).view('int64')
+
+        key_parts = [cleaned[i] for i in self.key_positions]
+        keys = key_parts[0].str.cat(key_parts[1:], sep='\t') if len(key_parts) > 1 else key_parts[0]
+        has_key = ~np.logical_or.reduce([part.to_numpy() == '\\N' for part in key_parts])
+
+        return keys.to_numpy(dtype=object), hashes, has_key
+
+    def filter(self, chunks):
+        for df in chunks:
+            if df.empty:
+                continue
+
+            keys, hashes, has_key = self.row_hashes(df)
+
+            pos = self.known_keys.get_indexer(keys)
+            old = self.known_hashes[np.maximum(pos, 0)] if len(self.known_hashes) else np.zeros(len(df), dtype='int64')
+            # the rows without key go to the merge, which counts them
+            changed = (pos < 0) | (old != hashes) | ~has_key
+
+            self.seen_keys.append(keys[has_key])
+            self.sent.append((keys[changed & has_key], hashes[changed & has_key], df.index[changed & has_key]))
+            self.unchanged += int((~changed).sum())
+
+            yield df[changed]
+
+    def delete_missing(self, cur, target):
+        # The rows of the previous imports which are not in this file
+        missing = self.known_keys.difference(np.concatenate(self.seen_keys) if self.seen_keys else [])
+        if missing.empty:
+            return 0
+
+        missing_table = f'{self.temp_prefix}_missing'
+        cur.execute(f'CREATE TEMP TABLE {missing_table} ON COMMIT DROP AS SELECT {quote_columns(self.key)} FROM {target} WITH NO DATA;')
+        cur.copy_expert(copy_query(missing_table), io.StringIO('\n'.join(missing) + '\n'))
+
+        same_key = ' AND '.join(f'm."{k}" = t."{k}"' for k in self.key)
+        cur.execute(f'DELETE FROM {target} t USING {missing_table} m WHERE {same_key};')
+        deleted = cur.rowcount
+        cur.execute(f'DELETE FROM {self.hash_table} h USING unnest(%s::text[]) AS m(row_key) WHERE h.row_key = m.row_key;', (list(missing),))
+        return deleted
+
+    def save(self, cur, rejected_rows=()):
+        if not self.sent:
+            return
+
+        keys = np.concatenate([k for k, _, _ in self.sent])
+        hashes = np.concatenate([h for _, h, _ in self.sent])
+        rows = np.concatenate([r for _, _, r in self.sent])
+
+        # the rejected rows are not in the table, and for repeated keys the last row is loaded
+        new = pd.DataFrame({'row_key': keys, 'row_hash': hashes})
+        new = new[~np.isin(rows, list(rejected_rows))].drop_duplicates('row_key', keep='last')
+        if new.empty:
+            return
+
+        new_table = f'{self.temp_prefix}_new'
+        cur.execute(f'CREATE TEMP TABLE {new_table} (row_key TEXT, row_hash BIGINT) ON COMMIT DROP;')
+        lines = copy_field_escape(new['row_key'].astype(object)) + '\t' + new['row_hash'].astype(str)
+        cur.copy_expert(copy_query(new_table), io.StringIO('\n'.join(lines) + '\n'))
+        cur.execute(f"""
+            INSERT INTO {self.hash_table} (row_key, row_hash)
+            SELECT row_key, row_hash FROM {new_table}
+            ON CONFLICT (row_key) DO UPDATE SET row_hash = EXCLUDED.row_hash;
+        """)
+
+
+# =========================================================
+# Parallel COPY of one file
+# The file is split into byte ranges at line boundaries, every range is parsed, cleaned
+# and copied by its own process over its own connection.
+# Quoted values with line breaks are not supported in this mode.
+# =========================================================
+
+def split_ranges(file_name, parts):
+    with open(file_name, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        header_end = next_lines(mm, 0, 1)
+        step = (size - header_end) / parts
+
+        bounds = [header_end]
+        for i in range(1, parts):
+            pos = next_lines(mm, int(header_end + i * step), 1)
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+        bounds.append(size)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class RangeReader:
+    """
+    A read-only file-like object over the [start, end) byte range of a file
+    """
+
+    def __init__(self, file_name, start, end):
+        self.file = open(file_name, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def copy_range_worker(file_name, start, end, config, columns, column_types, target, options, point=None):
+    chunk_size = config.get('chunk_size', 0) or 100000
+    vectorized_cleaning = config.get('vectorized_cleaning', True)
+    copy_format = config.get('copy_format', 'text')
+
+    conn = connect_db(config)
+    cur = conn.cursor()
+    reader = RangeReader(file_name, start, end)
 
-                for row in tqdm(
-                    df.itertuples(index=False, name=None),
-                    total=len(df),
-                    desc="Preparing buffer"
-                ):
-                    cleaned = clean_row_func(row)
-                    buffer.write(
-                        '\t'.join(escape_copy_value(v) for v in cleaned) + '\n'
-                    )
+    try:
+        with pd.read_csv(
+            reader,
+            sep=config.get('csv_sep', ','),
+            quotechar=config.get('csv_quote', '"'),
+            header=None,
+            names=[col for col in columns if not point or col != point[2]],
+            encoding='utf-8',
+            chunksize=chunk_size,
+            low_memory=False,
+            **read_csv_kwargs(options, columns)
+        ) as chunks:
+            if point:
+                chunks = add_point_column(chunks, *point)
+            if copy_format == 'binary':
+                blocks = copy_binary_blocks(chunks, columns, column_types, connection_encoding(conn))
+            else:
+                blocks = copy_lines(chunks, columns, column_types, vectorized_cleaning)
+            cur.copy_expert(copy_query(target, copy_format), CopyStream(blocks, encoding=connection_encoding(conn)))
+        return cur.rowcount
+    finally:
+        reader.close()
+        cur.close()
+        conn.close()
 
-                buffer.seek(0)
 
-                copy_sql = f"""
-                    COPY {schema_name}.{table_name}
-                    FROM STDIN
-                    WITH (FORMAT text, DELIMITER '\t', NULL '\\N')
-                """
+def parallel_copy_csv(file_name, config, columns, column_types, target, processes, options=None, point=None):
+    ranges = split_ranges(file_name, processes)
+    copied = 0
 
-                try:
-                    cur.copy_expert(copy_sql, buffer)
-                except Exception as e:
-                    print(f"COPY failed: {e}")
-                    raise
-                
-        cur.execute("COMMIT;")
-        print("Done")
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [
+            pool.submit(copy_range_worker, file_name, start, end, config, columns, column_types, target, options, point)
+            for start, end in ranges
+        ]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Copying ranges"):
+            copied += future.result()
 
+    return copied
+
+
+# =========================================================
+# Multiple files
+# A process pool, each worker holds its own database connection for all of its files
+# =========================================================
+
+worker_conn = None
+
+def init_worker(config):
+    global worker_conn
+    if not config.get('dry_run', True) and config.get('output', 'postgres') == 'postgres':
+        worker_conn = connect_db(config)
+
+def process_csv_worker(file_name, config, db_table_name, db_table_comment, confirm_delete):
+    try:
+        return process_csv(file_name, config, db_table_name, db_table_comment,
+                           conn=worker_conn, confirm_delete=confirm_delete, show_progress=False)
     except Exception as e:
-        print(f"Error occurred during database operation: {e}")
-        cur.execute("ROLLBACK;")
-        print("Transaction rolled back due to error.")
-
-else:
-    # A DEBUG option: printing instead of SQL operations
-    # Print create table
-    if create_table:
-        print(create_table_query)
-
-    if delete_data:
-        print(delete_data_query)
-    
-    # Print data
-    if insert_rows:
-        for index, row in enumerate(df.itertuples(index=False, name=None)):
-            clean_row = clean_row_func(row)
-
-            insert_query = f"""
-            INSERT INTO {schema_name}.{table_name}
-            VALUES ({', '.join(to_sql_literal(v) for v in clean_row)});
-            """
-
-            print(insert_query)
-
-# Close DB
-cur.close()
-conn.close()
-
-# Write to CSV
-#df.to_csv('modified.csv', index=False)
+        print(f"Error: {file_name}: {e}")
+        return {'file': file_name, 'table': None, 'rows': 0, 'seconds': 0, 'status': 'failed'}
+
+def print_summary(results):
+    print("\nSummary:")
+    print(f"{'file':<40} {'status':>8} {'rows':>10} {'seconds':>9} {'rows/s':>10}")
+    for r in results:
+        rate = r['rows'] / r['seconds'] if r['seconds'] else 0
+        print(f"{os.path.basename(r['file']):<40} {r['status']:>8} {r['rows']:>10} {r['seconds']:>9.2f} {rate:>10.0f}")
+    total_rows = sum(r['rows'] for r in results if r['status'] == 'ok')
+    failed = sum(1 for r in results if r['status'] == 'failed')
+    print(f"{len(results)} files, {total_rows} rows imported, {failed} failed")
+
+def process_many(file_names, config, workers, db_table_name=None, db_table_comment=None):
+    # Every file has its own table, named after the file
+    if db_table_name:
+        print(f"Warning: db_table_name / --target_table '{db_table_name}' is ignored with csv_glob, each file is imported into its own table.")
+        db_table_name = None
+
+    # One csv file per table: the files would overwrite each other in a single output file
+    output_dir = config.get('output_path', '')
+    if config.get('output', 'postgres') == 'csv' and output_dir and not os.path.isdir(output_dir):
+        print(f"Error: output_path must be an existing directory with csv_glob and csv output: {output_dir}")
+        sys.exit(1)
+
+    confirm_delete = None
+    to_database = not config.get('dry_run', True) and config.get('output', 'postgres') == 'postgres'
+    if config.get('delete_data', False) and to_database:
+        print("Do you want to truncate the destination tables of all files?")
+        answer = input("yes/no: ").strip().lower()
+        confirm_delete = answer == 'yes'
+
+    # The dry run output would be mixed up in the stdout or in one shared file, a directory has one script per table
+    dry_run_output = config.get('dry_run_output', '')
+    if config.get('dry_run', True) and config.get('output', 'postgres') == 'postgres' \
+            and not (dry_run_output and os.path.isdir(dry_run_output)):
+        workers = 1
+
+    start_time = time.perf_counter()
+    results = []
+
+    if workers == 1:
+        global worker_conn
+        init_worker(config)
+        try:
+            for file_name in file_names:
+                results.append(process_csv_worker(file_name, config, db_table_name, db_table_comment, confirm_delete))
+        finally:
+            # The pool workers close theirs at exit
+            if worker_conn:
+                worker_conn.close()
+                worker_conn = None
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(config,)) as pool:
+            futures = [
+                pool.submit(process_csv_worker, file_name, config, db_table_name, db_table_comment, confirm_delete)
+                for file_name in file_names
+            ]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Importing files"):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # e.g. a worker could not connect
+                    print(f"Error: {e}")
+
+    results.sort(key=lambda r: r['file'])
+    print_summary(results)
+    print(f"Total time: {time.perf_counter() - start_time:.2f} s")
+    return results
+
+
+def main():
+    # Argumentumok definiálása
+    parser = argparse.ArgumentParser(description="CSV Processing application for Postgres SQL Import.")
+    parser.add_argument("config_file", help="Config file name")
+    parser.add_argument("--csv_file", help="Csv file name")
+    parser.add_argument("--target_table", help="Target table name")
+    parser.add_argument("--table_comment", help="Table comments")
+    parser.add_argument("--csv_glob", help="Import all files matching this pattern (or all *.csv files of this directory)")
+    parser.add_argument("--workers", type=int, help="Number of parallel imports with --csv_glob")
+    parser.add_argument("--refresh_types", action="store_true", help="Detect the column types again instead of using the type cache")
+    parser.add_argument("--clear_type_cache", action="store_true", help="Delete all entries of the type cache")
+    parser.add_argument("--output", choices=['postgres', 'csv', 'parquet'], help="Write the cleaned data into csv or parquet files instead of the database")
+    parser.add_argument("--output_path", help="Output file or directory of --output csv/parquet")
+    parser.add_argument("--profile", nargs='?', const=True, help="Measure the import stages, the JSON report is appended to this file (default: <csv file>_profile.jsonl)")
+
+    # Argumentumok beolvasása
+    args = parser.parse_args()
+
+    # Ellenőrzés, hogy megadott-e a felhasználó argumentumokat
+    if not args.config_file:
+        print("Error: No config file name provided!")
+        sys.exit(1)
+
+    # Reading config file
+    try:
+        with open(args.config_file, 'r') as config_file:
+            config = json.load(config_file)
+    except FileNotFoundError:
+        print(f"Error: The given config file not found: {args.config_file}")
+        sys.exit(1)
+
+    file_name = args.csv_file or config.get('csv_file')
+    csv_glob = args.csv_glob or config.get('csv_glob')
+    workers = args.workers or config.get('workers', 4)
+    db_table_name = args.target_table or config.get('db_table_name') or None
+    db_table_comment = args.table_comment or config.get('db_table_comment')
+
+    if args.refresh_types:
+        config['type_cache_refresh'] = True
+
+    if args.profile:
+        config['profile'] = args.profile
+
+    if args.output:
+        config['output'] = args.output
+    if args.output_path:
+        config['output_path'] = args.output_path
+
+    if args.clear_type_cache:
+        if config.get('type_cache'):
+            type_cache = TypeCache(config['type_cache'])
+            type_cache.invalidate()
+            type_cache.close()
+            print(f"Type cache cleared: {config['type_cache']}")
+        if not (file_name or csv_glob):
+            return
+
+    if csv_glob and not args.csv_file:
+        if os.path.isdir(csv_glob):
+            csv_glob = os.path.join(csv_glob, '*.csv')
+        file_names = sorted(glob.glob(csv_glob))
+        if not file_names:
+            print(f"Error: No files found: {csv_glob}")
+            sys.exit(1)
+        process_many(file_names, config, workers, db_table_name, db_table_comment)
+        return
+
+    if not file_name:
+        print("Error: CSV file name not provided. Please specify either --csv_file or --csv_glob argument or 'csv_file' in the config file.")
+        sys.exit(1)
+
+    process_csv(file_name, config, db_table_name, db_table_comment)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+# Benchmarks for csv_proc.py
+#
+# Usage:
+# python csv_proc_benchmark.py cleaning [--rows 1000000] [--chunk_size 100000]
+# python csv_proc_benchmark.py reader [--csv_file x.csv --sep ';' --quote '"'] [--rows 1000000] [--chunk_size 100000]
+# python csv_proc_benchmark.py import [--config db.json] [--stub] [--rows 200000 | --size_mb 500] [--extra_columns 0]
+#                                     [--modes copy,binary,batch,safe,dry_run] [--chunk_size 100000] [--keep_csv x.csv] [--report bench.jsonl]
+# python csv_proc_benchmark.py generate --output x.csv [--rows 200000 | --size_mb 500] [--extra_columns 0]
+#
+# cleaning: compares the row by row clean_row_func() with the vectorized clean_chunk_func()
+#           on a synthetic DataFrame, and checks that both produce the same COPY text
+# reader:   compares the pandas and the pyarrow csv readers, whole file and in chunks,
+#           on a real file or on a synthetic one, and checks that both give the same COPY text
+# import:   imports a synthetic OBM-like csv file with csv_proc.process_csv() in each mode, each in a new process,
+#           and reports the rows/s, MB/s and peak memory. With --config the database of the config is used
+#           (each mode into its own table, dropped at the end), without it (or with --stub) a stub connection
+#           reads and drops the COPY data, so the client side can be measured without a server.
+# generate: writes the synthetic csv file only
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import csv_proc
+
+
+COLUMN_TYPES = {
+    'id': 'INTEGER',
+    'egyedszam': 'INTEGER',
+    'szelesseg': 'DOUBLE PRECISION',
+    'hosszusag': 'DOUBLE PRECISION',
+    'datum': 'DATE',
+    'ido': 'TIME WITHOUT TIME ZONE',
+    'faj': 'TEXT',
+    'megjegyzes': 'TEXT',
+}
+
+
+def make_frame(rows, seed=42):
+    # Synthetic OBM-like data as it comes out from read_csv (strings for dates and times)
+    rng = np.random.default_rng(seed)
+
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'egyedszam': rng.integers(0, 50, rows).astype('float64'),
+        'szelesseg': np.round(rng.uniform(45.7, 48.6, rows), 6),
+        'hosszusag': np.round(rng.uniform(16.1, 22.9, rows), 6),
+        'datum': pd.to_datetime('2020-01-01') + pd.to_timedelta(rng.integers(0, 2000, rows), unit='D'),
+        'ido': rng.integers(0, 24, rows).astype(str),
+        'faj': rng.choice(['Parus major', 'Sitta europaea', 'Erithacus rubecula', 'Fringilla coelebs'], rows),
+        'megjegyzes': rng.choice(['', 'ok', 'árvíztűrő tükörfúrógép', 'null', 'a\\b', 'x\ty'], rows),
+    })
+    df['datum'] = df['datum'].dt.strftime('%Y-%m-%d')
+    df['ido'] = df['ido'].str.zfill(2) + ':' + pd.Series(rng.integers(0, 60, rows)).astype(str).str.zfill(2)
+
+    # ~5% empty cells
+    for col in ['egyedszam', 'datum', 'megjegyzes']:
+        df.loc[rng.random(rows) < 0.05, col] = np.nan
+
+    return df
+
+
+# Header of the generated csv, as in the OBM exports
+OBM_HEADER = {
+    'id': 'ID',
+    'faj': 'Faj neve',
+    'magyar_nev': 'Magyar név',
+    'egyedszam': 'Egyedszám',
+    'szelesseg': 'szélesség',
+    'hosszusag': 'hosszúság',
+    'datum': 'Dátum',
+    'ido': 'Idő',
+    'megjegyzes': 'megjegyzés',
+    'obm_geometry': 'obm_geometry',
+}
+
+MAGYAR_NEVEK = ['széncinege', 'csuszka', 'vörösbegy', 'erdei pinty', 'őszapó', 'fülemüle', 'búbos banka', None]
+
+EXTRA_TYPES = ['int', 'float', 'text', 'date']
+
+
+def make_obm_frame(rows, extra_columns=0, seed=42, start=0):
+    # make_frame() with the other usual columns of an OBM export: accented names, a WKT point, and extra columns
+    rng = np.random.default_rng(seed + start)
+    df = make_frame(rows, seed + start)
+    df['id'] = np.arange(start, start + rows)
+    df['magyar_nev'] = rng.choice(np.array(MAGYAR_NEVEK, dtype=object), rows)
+    df['obm_geometry'] = 'POINT(' + df['hosszusag'].astype(str) + ' ' + df['szelesseg'].astype(str) + ')'
+    df.loc[rng.random(rows) < 0.02, 'obm_geometry'] = np.nan
+
+    for i in range(extra_columns):
+        kind = EXTRA_TYPES[i % len(EXTRA_TYPES)]
+        if kind == 'int':
+            values = pd.Series(rng.integers(-1000, 100000, rows)).astype('Int64')
+        elif kind == 'float':
+            values = pd.Series(np.round(rng.normal(100, 50, rows), 3))
+        elif kind == 'text':
+            values = pd.Series(rng.choice(['gyep', 'erdő', 'nádas', 'szántó', 'árok, töltés', 'vízpart "É"'], rows))
+        else:
+            values = pd.Series(rng.integers(0, 3000, rows)).map(lambda d: (pd.Timestamp('2015-01-01') + pd.Timedelta(days=d)).strftime('%Y.%m.%d'))
+        values[rng.random(rows) < 0.1] = None
+        df[f'extra_{i + 1}_{kind}'] = values
+
+    return df.rename(columns=OBM_HEADER)
+
+
+def make_csv(file_name, rows=None, size_mb=None, extra_columns=0, sep=';', chunk_size=100000, seed=42):
+    # Writes the synthetic file in chunks, so big files do not need much memory
+    # With size_mb the number of rows is estimated from the first chunk
+    if size_mb:
+        sample = make_obm_frame(10000, extra_columns, seed).to_csv(sep=sep, index=False, header=False)
+        rows = max(1, int(size_mb * 1024 ** 2 / (len(sample.encode('utf-8')) / 10000)))
+
+    with open(file_name, 'w', encoding='utf-8', newline='') as f:
+        for start in range(0, rows, chunk_size):
+            df = make_obm_frame(min(chunk_size, rows - start), extra_columns, seed, start)
+            df.to_csv(f, sep=sep, index=False, header=start == 0, lineterminator='\n')
+
+    return rows
+
+
+# =========================================================
+# Stub connection
+# =========================================================
+# Enough of the psycopg2 connection and cursor for process_csv() in the copy, batch and safe modes:
+# the statements are dropped, the COPY data is read through in 64K blocks like psycopg2 does.
+
+class StubConnection:
+    encoding = 'UTF8'
+
+    def __init__(self):
+        self.copied_bytes = 0
+        self.statements = 0
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def get_transaction_status(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class StubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.connection.statements += 1
+
+    def mogrify(self, template, params):
+        return repr(params).encode('utf-8')
+
+    def copy_expert(self, query, buffer, size=65536):
+        while True:
+            block = buffer.read(size)
+            if not block:
+                break
+            self.connection.copied_bytes += len(block)
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+BENCH_MODES = {
+    'copy': {},
+    'binary': {'copy_format': 'binary'},
+    'batch': {'sql_copy_no': True},
+    'safe': {'row_error_check': True},
+    'dry_run': {'dry_run': True, 'dry_run_format': 'copy'},
+}
+
+
+def run_mode(csv_file, config, table, stub, verbose):
+    # One mode in its own process, so the peak memory belongs to this mode only
+    conn = StubConnection() if stub and not config.get('dry_run') else None
+    output = None if verbose else open(os.devnull, 'w')
+    with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+        result = csv_proc.process_csv(csv_file, config, table, conn=conn, confirm_delete=True, show_progress=verbose)
+    if output:
+        output.close()
+
+    result['peak_rss_mb'] = csv_proc.peak_rss_mb()
+    if conn is not None:
+        result['copied_mb'] = round(conn.copied_bytes / 1024 ** 2, 2)
+    return result
+
+
+def bench_import(args):
+    config = {}
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+    stub = args.stub or not args.config
+    if not stub:
+        conn = csv_proc.connect_db(config)
+        conn.close()
+
+    csv_file = args.keep_csv or tempfile.NamedTemporaryFile(suffix='.csv', delete=False).name
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        t0 = time.perf_counter()
+        rows = make_csv(csv_file, args.rows, args.size_mb, args.extra_columns, ';', args.chunk_size or 100000)
+        size = os.path.getsize(csv_file) / 1024 ** 2
+        print(f"{csv_file}: {rows} rows, {size:.1f} MB, {len(OBM_HEADER) + args.extra_columns} columns ({time.perf_counter() - t0:.1f} s)")
+        print(f"Sink: {'stub' if stub else config.get('dbname')}")
+
+        print(f"{'mode':<10} {'status':>8} {'seconds':>9} {'rows/s':>10} {'MB/s':>8} {'peak MB':>9}")
+        report = []
+        for mode in args.modes.split(','):
+            if mode not in BENCH_MODES:
+                print(f"Unknown mode: {mode}")
+                continue
+            table = f'csv_proc_bench_{mode}'
+            mode_config = {
+                'db_schema_name': '',
+                **config,
+                'csv_sep': ';',
+                'dry_run': False,
+                'create_table': True,
+                'chunk_size': args.chunk_size,
+                'dry_run_output': os.path.join(tmp_dir, f'{mode}.sql'),
+                **BENCH_MODES[mode],
+            }
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(run_mode, csv_file, mode_config, table, stub, args.verbose).result()
+
+            seconds = result['seconds']
+            print(f"{mode:<10} {result['status']:>8} {seconds:>9.2f} {rows / seconds:>10.0f} {size / seconds:>8.1f} {result['peak_rss_mb'] or 0:>9.0f}")
+            report.append({'mode': mode, 'rows': rows, 'file_mb': round(size, 2), **{k: v for k, v in result.items() if k != 'file'}})
+
+            if not stub and not mode_config['dry_run']:
+                conn = csv_proc.connect_db(config)
+                conn.cursor().execute(f'DROP TABLE IF EXISTS {result["table"]};')
+                conn.close()
+
+        if args.report:
+            with open(args.report, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    'time': datetime.now().isoformat(timespec='seconds'),
+                    'version': csv_proc.VERSION,
+                    'sink': 'stub' if stub else 'postgres',
+                    'chunk_size': args.chunk_size,
+                    'extra_columns': args.extra_columns,
+                    'modes': report,
+                }, default=str) + '\n')
+            print(f"Report: {args.report}")
+    finally:
+        if not args.keep_csv:
+            os.unlink(csv_file)
+        for name in os.listdir(tmp_dir):
+            os.unlink(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+
+def bench_generate(args):
+    t0 = time.perf_counter()
+    rows = make_csv(args.output, args.rows, args.size_mb, args.extra_columns, args.sep)
+    print(f"{args.output}: {rows} rows, {os.path.getsize(args.output) / 1024 ** 2:.1f} MB ({time.perf_counter() - t0:.1f} s)")
+
+
+def bench_cleaning(args):
+    df = make_frame(args.rows)
+    columns = list(df.columns)
+    column_types = COLUMN_TYPES
+    chunks = [df.iloc[i:i + args.chunk_size] for i in range(0, len(df), args.chunk_size)]
+
+    print(f"{args.rows} rows, {len(columns)} columns")
+    for col in columns:
+        print(f"  {col}: {column_types[col]}")
+
+    results = {}
+    for name, vectorized in [('row loop', False), ('vectorized', True)]:
+        t0 = time.perf_counter()
+        results[name] = ''.join(csv_proc.copy_lines(chunks, columns, column_types, vectorized))
+        elapsed = time.perf_counter() - t0
+        print(f"{name:>12}: {elapsed:8.2f} s  {args.rows / elapsed:12.0f} rows/s")
+
+    print("Same output:", results['row loop'] == results['vectorized'])
+
+
+def bench_reader(args):
+    csv_file = args.csv_file
+    if not csv_file:
+        tmp = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+        tmp.close()
+        make_frame(args.rows).to_csv(tmp.name, sep=args.sep, index=False)
+        csv_file = tmp.name
+
+    try:
+        size = os.path.getsize(csv_file)
+        encoding, total_rows, sample_df = csv_proc.scan_file(csv_file, args.sep, args.quote, 10000)
+        sample_df = csv_proc.normalize_column_names(sample_df)
+        columns = list(sample_df.columns)
+        column_types = csv_proc.detect_column_types(sample_df, columns)
+        options = csv_proc.read_options(columns, column_types, sample_df)
+
+        print(f"{csv_file}: {total_rows} rows, {len(columns)} columns, {size / 1024 ** 2:.1f} MB")
+
+        for chunk_size in [0, args.chunk_size]:
+            digests = {}
+            for reader in ['pandas', 'pyarrow']:
+                t0 = time.perf_counter()
+                rows = 0
+                for df in csv_proc.read_chunks(csv_file, args.sep, args.quote, chunk_size, options, columns, column_types, reader):
+                    rows += len(df)
+                elapsed = time.perf_counter() - t0
+
+                # the same data after cleaning
+                digest = hashlib.sha1()
+                for df in csv_proc.read_chunks(csv_file, args.sep, args.quote, chunk_size, options, columns, column_types, reader):
+                    digest.update(csv_proc.clean_chunk_func(df, columns, column_types).encode('utf-8'))
+                digests[reader] = digest.hexdigest()
+
+                print(f"{reader:>8} chunk_size={chunk_size:<8}: {elapsed:8.2f} s  {rows / elapsed:12.0f} rows/s  {size / 1024 ** 2 / elapsed:8.1f} MB/s")
+
+            print("Same output:", digests['pandas'] == digests['pyarrow'])
+    finally:
+        if not args.csv_file:
+            os.unlink(csv_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="csv_proc.py benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    cleaning = subparsers.add_parser("cleaning", help="row by row vs vectorized cleaning")
+    cleaning.add_argument("--rows", type=int, default=1000000)
+    cleaning.add_argument("--chunk_size", type=int, default=100000)
+    cleaning.set_defaults(func=bench_cleaning)
+
+    reader = subparsers.add_parser("reader", help="pandas vs pyarrow csv reader")
+    reader.add_argument("--csv_file", help="A real data file, default is a synthetic one")
+    reader.add_argument("--sep", default=';')
+    reader.add_argument("--quote", default='"')
+    reader.add_argument("--rows", type=int, default=1000000)
+    reader.add_argument("--chunk_size", type=int, default=100000)
+    reader.set_defaults(func=bench_reader)
+
+    importer = subparsers.add_parser("import", help="csv_proc.process_csv() in each mode on a synthetic file")
+    importer.add_argument("--config", help="A csv_proc config json with the database connection, default is the stub connection")
+    importer.add_argument("--stub", action="store_true", help="Use the stub connection even if there is a config")
+    importer.add_argument("--rows", type=int, default=200000)
+    importer.add_argument("--size_mb", type=float, help="File size instead of --rows")
+    importer.add_argument("--extra_columns", type=int, default=0, help="Number of additional int/float/text/date columns")
+    importer.add_argument("--modes", default="copy,binary,batch,safe,dry_run")
+    importer.add_argument("--chunk_size", type=int, default=100000)
+    importer.add_argument("--keep_csv", help="Write the synthetic file here and do not delete it")
+    importer.add_argument("--report", help="Append the results as one JSON line to this file")
+    importer.add_argument("--verbose", action="store_true", help="Show the output of csv_proc")
+    importer.set_defaults(func=bench_import)
+
+    generate = subparsers.add_parser("generate", help="write a synthetic OBM-like csv file")
+    generate.add_argument("--output", required=True)
+    generate.add_argument("--rows", type=int, default=200000)
+    generate.add_argument("--size_mb", type=float, help="File size instead of --rows")
+    generate.add_argument("--extra_columns", type=int, default=0)
+    generate.add_argument("--sep", default=';')
+    generate.set_defaults(func=bench_generate)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,13 +17,22 @@
 #             from the superspecies folder into the directory where the script runs.
 # Usage example:
 # python3 csv_validation.py --input=fajnevek.csv --columns="Élőhely_Kötődő_fajok_(lista)_latin:taxon" --columns="Faj_neve_latin:taxon" --columns="Élőhely_Kötődő_fajok_(lista)_hu:token" --columns="Faj_neve_hu:token"
+# --verify_blocking: the fuzzy matches (blocking index and matrix scoring) are checked against the
+#                    full reference list scored one by one (slow, for testing), the recall is printed for each column
+# --cache:    SQLite file of the earlier validation results, default csv_validation_cache.sqlite.
+#             The results are reused until the SSP files or the score settings change.
+# --no_cache: do not use the result cache
 
 import pandas as pd
+import numpy as np
 from rapidfuzz import process, fuzz
 from pathlib import Path
 import re
 import unicodedata
 import argparse
+import hashlib
+import json
+import sqlite3
 
 # =========================================================
 # CLI
@@ -43,6 +52,24 @@ parser.add_argument(
     help="format: COLUMN_NAME:SCORER"
 )
 
+parser.add_argument(
+    "--cache",
+    default="csv_validation_cache.sqlite",
+    help="SQLite file of the match result cache"
+)
+
+parser.add_argument(
+    "--no_cache",
+    action="store_true",
+    help="do not use the match result cache"
+)
+
+parser.add_argument(
+    "--verify_blocking",
+    action="store_true",
+    help="compare the blocking index candidates with the brute force search"
+)
+
 args = parser.parse_args()
 
 # =========================================================
@@ -97,6 +124,8 @@ for item in args.columns:
         SSP_CONFIG[scorer_name].copy()
     )
 
+    VALIDATION_CONFIG[col_name]["name"] = scorer_name
+
 VALIDATION_INPUT_CSV = args.input
 
 # fuzzy minimum score
@@ -104,6 +133,20 @@ VALIDATION_INPUT_CSV = args.input
 #FUZZY_LOW = 60
 EPITHET_PRIORITY_THRESHOLD = 70
 
+# taxon_score() és az epithet rescue súlyai (a találat cache kulcsának is része)
+TAXON_WEIGHTS = {
+    "genus": 0.55,
+    "genus_min": 85,          # ez alatt genus mismatch
+    "genus_penalty": 30,
+    "species": 0.45,
+    "generic_bonus": 25,      # sp./spp. azonos genusszal
+    "infra": 0.35,
+    "token_diff_penalty": 8,
+    "epithet_min": 85,        # epithet rescue
+    "epithet": 0.8,
+    "epithet_genus": 0.2
+}
+
 def canonicalize(text):
 
     if text is None:
@@ -156,6 +199,14 @@ def normalize_taxon(text):
 
     return parts
 
+def canonicalize_compact(text):
+
+    text = canonicalize(text)
+
+    text = re.sub(r'[\s\-]+', '', text)
+
+    return text
+
 GENERIC_SPECIES = {
     "sp",
     "sp.",
@@ -163,6 +214,43 @@ GENERIC_SPECIES = {
     "spp."
 }
 
+# genus, species epithet, infra epithet ("" ha nincs) és a tokenek száma
+def taxon_tokens(parts):
+
+    return (
+        parts[0] if len(parts) > 0 else "",
+        parts[1] if len(parts) > 1 else "",
+        parts[2] if len(parts) > 2 else "",
+        len(parts)
+    )
+
+
+# A referencia nevek előre feldolgozva, oszloponként (a canonical_keys sorrendjében),
+# hogy a pontozás csak string távolságot számoljon
+def build_token_store(canonical_keys):
+
+    store = {
+        "genus": [],
+        "epithet": [],
+        "infra": [],
+        "count": [],
+        "compact": []
+    }
+
+    for candidate in canonical_keys:
+
+        genus, epithet, infra, count = taxon_tokens(
+            normalize_taxon(candidate)
+        )
+
+        store["genus"].append(genus)
+        store["epithet"].append(epithet)
+        store["infra"].append(infra)
+        store["count"].append(count)
+        store["compact"].append(canonicalize_compact(candidate))
+
+    return store
+
 
 # =========================================================
 # SSP ADATOK BETÖLTÉSE
@@ -191,14 +279,20 @@ for cfg in SSP_CONFIG.values():
             .tolist()
         )
 
+        canonical_map = {
+            canonicalize(v): v
+            for v in values
+        }
+
         ssp_cache[key] = {
 
             "original_set": set(values),
 
-            "canonical_map": {
-                canonicalize(v): v
-                for v in values
-            }
+            "canonical_map": canonical_map,
+
+            "tokens": build_token_store(
+                list(canonical_map.keys())
+            )
         }
 
     for full_name in values:
@@ -216,13 +310,288 @@ for cfg in SSP_CONFIG.values():
 
                 species_epithet_index[species] = []
 
+            # a genus is, hogy a rescue ne tokenizáljon újra
             species_epithet_index[species].append(
-                full_name
+                (full_name, parts[0])
             )
 
 print("OK")
 
 
+# =========================================================
+# MATCH CACHE
+# =========================================================
+# érték -> (match_type, fuzzy_score, suggestions) a korábbi futásokból.
+# A kulcs része az összes SSP fájl hash-e (az epithet index minden fájl neveit tartalmazza),
+# a konfiguráció és a súlyok, így ezek változásakor a régi eredmények törlődnek.
+
+CACHE_VERSION = 1
+
+CACHE_QUERY_SIZE = 500
+
+
+def file_hash(file_name):
+
+    digest = hashlib.sha1()
+
+    with open(file_name, "rb") as f:
+
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def match_cache_key(cfg, ssp_hashes):
+
+    settings = {
+        "version": CACHE_VERSION,
+        "ssp": ssp_hashes,
+        "file": cfg["file"],
+        "column": cfg["column"],
+        "scorer": cfg["scorer"],
+        "low_score": cfg["low_score"],
+        "high_score": cfg["high_score"],
+        "weights": TAXON_WEIGHTS,
+        "epithet_priority": EPITHET_PRIORITY_THRESHOLD
+    }
+
+    return hashlib.sha1(
+        json.dumps(settings, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def open_match_cache(file_name, keys):
+
+    conn = sqlite3.connect(file_name)
+
+    # a score típus nélkül, hogy az int/float érték ne változzon
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS match_cache (
+            cache_key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            match_type TEXT,
+            score,
+            suggestions TEXT,
+            PRIMARY KEY (cache_key, value)
+        )
+    """)
+
+    # a régi SSP fájlok és beállítások eredményei
+    conn.execute(
+        f"DELETE FROM match_cache WHERE cache_key NOT IN ({','.join('?' * len(keys))})",
+        list(keys)
+    )
+
+    conn.commit()
+
+    return conn
+
+
+def match_cache_get(conn, key, values):
+
+    found = {}
+
+    for start in range(0, len(values), CACHE_QUERY_SIZE):
+
+        chunk = values[start:start + CACHE_QUERY_SIZE]
+
+        rows = conn.execute(
+            "SELECT value, match_type, score, suggestions FROM match_cache "
+            f"WHERE cache_key = ? AND value IN ({','.join('?' * len(chunk))})",
+            [key] + list(chunk)
+        )
+
+        for value, match_type, score, suggestions in rows:
+
+            found[value] = (match_type, score, suggestions)
+
+    return found
+
+
+def match_cache_put(conn, key, results):
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO match_cache VALUES (?, ?, ?, ?, ?)",
+        [
+            (key, value, match_type, score, suggestions)
+            for value, (match_type, score, suggestions) in results.items()
+        ]
+    )
+
+    conn.commit()
+
+
+match_cache = None
+
+match_cache_keys = {}
+
+if not args.no_cache:
+
+    ssp_hashes = {
+        cfg["file"]: file_hash(cfg["file"])
+        for cfg in SSP_CONFIG.values()
+    }
+
+    for name, cfg in SSP_CONFIG.items():
+
+        match_cache_keys[name] = match_cache_key(cfg, ssp_hashes)
+
+    match_cache = open_match_cache(
+        args.cache,
+        set(match_cache_keys.values())
+    )
+
+
+# =========================================================
+# BLOCKING INDEX
+# =========================================================
+# A fuzzy keresés nem az összes referencia néven fut végig, csak azokon,
+# amelyek a pontszám felső korlátja alapján elérhetik a low_score-t.
+# taxon: genus szerinti blokkok (és token szám), a genus hasonlóságot egyszer
+#        számoljuk blokkonként, ebből korlátozzuk a taxon_score()-t
+# token: a tömörített név hossza szerinti blokkok, fuzz.ratio <= 200 * min(la, lb) / (la + lb)
+# Veszteségmentes: ugyanazokat a találatokat adja, mint a teljes keresés (--verify_blocking)
+
+BOUND_EPSILON = 1e-9
+
+
+def taxon_score_bound(genus_score, a_len, b_len):
+
+    # taxon_score() legnagyobb értéke adott genus pontszámnál és token számoknál
+    score = 0
+
+    if a_len > 0 and b_len > 0:
+
+        score += genus_score * TAXON_WEIGHTS["genus"]
+
+        if genus_score < TAXON_WEIGHTS["genus_min"]:
+
+            score -= TAXON_WEIGHTS["genus_penalty"]
+
+    # species: 100 * súly (vagy a generic bonus)
+    if a_len > 1 and b_len > 1:
+
+        score += max(100 * TAXON_WEIGHTS["species"], TAXON_WEIGHTS["generic_bonus"])
+
+    if a_len > 2 and b_len > 2:
+
+        score += 100 * TAXON_WEIGHTS["infra"]
+
+    score -= abs(a_len - b_len) * TAXON_WEIGHTS["token_diff_penalty"]
+
+    return score
+
+
+def genus_cutoff(a_len, b_len, low_score):
+
+    # a legkisebb genus pontszám, amivel még elérhető a low_score
+    base = taxon_score_bound(0, a_len, b_len)
+
+    cutoff = (low_score - base) / TAXON_WEIGHTS["genus"]
+
+    if cutoff < TAXON_WEIGHTS["genus_min"]:
+
+        return max(cutoff, 0)
+
+    cutoff = max(
+        (low_score - base - TAXON_WEIGHTS["genus_penalty"]) / TAXON_WEIGHTS["genus"],
+        TAXON_WEIGHTS["genus_min"]
+    )
+
+    if cutoff > 100:
+
+        return None
+
+    return cutoff
+
+
+def build_blocking_index(store, scorer):
+
+    blocks = {}
+
+    for i in range(len(store["count"])):
+
+        if scorer == "taxon":
+
+            if store["count"][i] == 0:
+                continue
+
+            genus_blocks = blocks.setdefault(store["genus"][i], {})
+            genus_blocks.setdefault(store["count"][i], []).append(i)
+
+        else:
+
+            length = len(store["compact"][i])
+
+            blocks.setdefault(length, []).append(i)
+
+    return blocks
+
+
+# A pontozandó referencia nevek indexei
+def blocking_candidates(value_tokens, value_compact, cfg, blocks):
+
+    low_score = cfg.get("low_score")
+
+    indices = []
+
+    if cfg.get("scorer") == "taxon":
+
+        a_genus, _, _, a_len = value_tokens
+
+        if a_len == 0:
+            return []
+
+        token_counts = {
+            b_len
+            for genus_blocks in blocks.values()
+            for b_len in genus_blocks
+        }
+
+        cutoffs = [
+            genus_cutoff(a_len, b_len, low_score)
+            for b_len in token_counts
+        ]
+        cutoffs = [c for c in cutoffs if c is not None]
+
+        if not cutoffs:
+            return []
+
+        genus_matches = process.extract(
+            a_genus,
+            list(blocks.keys()),
+            scorer=fuzz.ratio,
+            score_cutoff=max(min(cutoffs) - BOUND_EPSILON, 0),
+            limit=None
+        )
+
+        for genus, genus_score, _ in genus_matches:
+
+            for b_len, hits in blocks[genus].items():
+
+                if taxon_score_bound(genus_score, a_len, b_len) >= low_score - BOUND_EPSILON:
+
+                    indices.extend(hits)
+
+    else:
+
+        a_len = len(value_compact)
+
+        for b_len, hits in blocks.items():
+
+            if a_len + b_len == 0:
+                continue
+
+            if 200 * min(a_len, b_len) / (a_len + b_len) >= low_score - BOUND_EPSILON:
+
+                indices.extend(hits)
+
+    # az eredeti sorrend, hogy az egyenlő pontszámok sorrendje ne változzon
+    return sorted(indices)
+
+
 # =========================================================
 # VALIDATION_INPUT CSV BETÖLTÉS
 # =========================================================
@@ -234,10 +603,9 @@ df = pd.read_csv(VALIDATION_INPUT_CSV)
 print(f"{len(df)} rows")
 
 
-def taxon_score(a, b):
-
-    a_parts = normalize_taxon(a)
-    b_parts = normalize_taxon(b)
+# Két név pontszáma a taxon_tokens() értékeiből, egyenként.
+# A validálás a taxon_score_matrix()-ot használja, ez a --verify_blocking referenciája.
+def taxon_score(a_genus, a_species, a_infra, a_len, b_genus, b_species, b_infra, b_len):
 
     score = 0
 
@@ -245,29 +613,26 @@ def taxon_score(a, b):
     # GENUS
     # =====================================================
 
-    if len(a_parts) > 0 and len(b_parts) > 0:
+    if a_len > 0 and b_len > 0:
 
         genus_score = fuzz.ratio(
-            a_parts[0],
-            b_parts[0]
+            a_genus,
+            b_genus
         )
 
-        score += genus_score * 0.55 #0.25
+        score += genus_score * TAXON_WEIGHTS["genus"] #0.25
 
         # genus mismatch penalty
-        if genus_score < 85:
+        if genus_score < TAXON_WEIGHTS["genus_min"]:
 
-            score -= 30
+            score -= TAXON_WEIGHTS["genus_penalty"]
 
     # =====================================================
     # SPECIES
     # =====================================================
 
-    if len(a_parts) > 1 and len(b_parts) > 1:
+    if a_len > 1 and b_len > 1:
 
-        a_species = a_parts[1]
-        b_species = b_parts[1]
-        
         # -------------------------------------------------
         # GENERIC spp./sp.
         # -------------------------------------------------
@@ -278,9 +643,9 @@ def taxon_score(a, b):
         ):
 
             # genus egyezés esetén erős bonus
-            if a_parts[0] == b_parts[0]:
+            if a_genus == b_genus:
 
-                score += 25
+                score += TAXON_WEIGHTS["generic_bonus"]
 
         else:
 
@@ -289,48 +654,223 @@ def taxon_score(a, b):
                 b_species
             )
 
-            score += species_score * 0.45
+            score += species_score * TAXON_WEIGHTS["species"]
 
     # =====================================================
     # INFRA TAXON
     # =====================================================
 
-    if len(a_parts) > 2 and len(b_parts) > 2:
+    if a_len > 2 and b_len > 2:
 
         infra_score = fuzz.ratio(
-            a_parts[2],
-            b_parts[2]
+            a_infra,
+            b_infra
         )
 
         # ez kapja a LEGNAGYOBB súlyt
-        score += infra_score * 0.35 #0.60
+        score += infra_score * TAXON_WEIGHTS["infra"] #0.60
 
     # =====================================================
     # TOKEN COUNT PENALTY
     # =====================================================
 
     token_diff = abs(
-        len(a_parts) - len(b_parts)
+        a_len - b_len
     )
 
-    score -= token_diff * 8
+    score -= token_diff * TAXON_WEIGHTS["token_diff_penalty"]
 
     return max(score, 0)
 
+
 # =========================================================
-# VALIDÁLÁS
+# BATCH SCORING
 # =========================================================
-def canonicalize_compact(text):
+# Egy oszlop összes (különböző) nem egyező értéke egyszerre, mátrixként:
+# process.cdist (minden szálon) a genus, epithet és infra tokenekre,
+# a taxon_score() súlyai és büntetései NumPy-val, ugyanabban a sorrendben,
+# így az eredmény pontosan egyezik a taxon_score()-ral.
 
-    text = canonicalize(text)
+FUZZY_BATCH_SIZE = 256
 
-    text = re.sub(r'[\s\-]+', '', text)
 
-    return text
+def ratio_matrix(a, b, scorer=fuzz.ratio):
+
+    if not a or not b:
+        return np.zeros((len(a), len(b)))
+
+    return process.cdist(
+        a,
+        b,
+        scorer=scorer,
+        dtype=np.float64,
+        workers=-1
+    )
+
+
+def taxon_score_matrix(value_tokens, store, columns):
+
+    a_genus, a_species, a_infra, a_len = (list(t) for t in zip(*value_tokens))
+
+    b_genus = [store["genus"][i] for i in columns]
+    b_species = [store["epithet"][i] for i in columns]
+    b_infra = [store["infra"][i] for i in columns]
+
+    a_len = np.array(a_len)[:, None]
+    b_len = np.array([store["count"][i] for i in columns])[None, :]
+
+    score = np.zeros((len(value_tokens), len(columns)))
+
+    # GENUS
+    genus_score = ratio_matrix(a_genus, b_genus)
+
+    has_genus = (a_len > 0) & (b_len > 0)
+
+    score = np.where(has_genus, score + genus_score * TAXON_WEIGHTS["genus"], score)
+
+    score = np.where(
+        has_genus & (genus_score < TAXON_WEIGHTS["genus_min"]),
+        score - TAXON_WEIGHTS["genus_penalty"],
+        score
+    )
+
+    # SPECIES
+    has_species = (a_len > 1) & (b_len > 1)
+
+    generic = (
+        np.isin(np.array(a_species, dtype=object), list(GENERIC_SPECIES))[:, None]
+        | np.isin(np.array(b_species, dtype=object), list(GENERIC_SPECIES))[None, :]
+    )
+
+    same_genus = (
+        np.array(a_genus, dtype=object)[:, None]
+        == np.array(b_genus, dtype=object)[None, :]
+    )
+
+    score = np.where(has_species & generic & same_genus, score + TAXON_WEIGHTS["generic_bonus"], score)
+
+    species_score = ratio_matrix(a_species, b_species)
+
+    score = np.where(has_species & ~generic, score + species_score * TAXON_WEIGHTS["species"], score)
+
+    # INFRA TAXON
+    has_infra = (a_len > 2) & (b_len > 2)
+
+    infra_score = ratio_matrix(a_infra, b_infra)
+
+    score = np.where(has_infra, score + infra_score * TAXON_WEIGHTS["infra"], score)
+
+    # TOKEN COUNT PENALTY
+    score = score - np.abs(a_len - b_len) * TAXON_WEIGHTS["token_diff_penalty"]
+
+    return np.maximum(score, 0)
+
+
+def score_matrix(cfg, value_tokens, value_compacts, store, columns):
+
+    # For scientific names we have our own scorer: taxon_score()
+    if cfg.get("scorer") == "taxon":
+
+        return taxon_score_matrix(value_tokens, store, columns)
+
+    # For national names we can use the built in token_set_ratio()
+    return ratio_matrix(
+        value_compacts,
+        [store["compact"][i] for i in columns],
+        scorer=fuzz.token_set_ratio
+    )
+
+
+# value_canonical -> [(canonical key, score), ...] a low_score feletti találatok, a referencia sorrendjében
+# blocks nélkül a teljes referencia listán
+def fuzzy_matches(values_canonical, cfg, store, canonical_keys, blocks=None):
+
+    found = {}
+
+    for start in range(0, len(values_canonical), FUZZY_BATCH_SIZE):
+
+        batch = values_canonical[start:start + FUZZY_BATCH_SIZE]
+
+        value_tokens = [
+            taxon_tokens(normalize_taxon(v))
+            for v in batch
+        ]
+
+        value_compacts = [
+            canonicalize_compact(v)
+            for v in batch
+        ]
+
+        if blocks is None:
+
+            columns = np.arange(len(canonical_keys))
+
+        else:
+
+            # a blokkok uniója a batch értékeire
+            columns = np.unique(np.array([
+                i
+                for tokens, compact in zip(value_tokens, value_compacts)
+                for i in blocking_candidates(tokens, compact, cfg, blocks)
+            ], dtype=np.int64))
+
+        scores = score_matrix(cfg, value_tokens, value_compacts, store, columns)
+
+        for row, value_canonical in enumerate(batch):
+
+            hits = np.nonzero(scores[row] >= cfg.get("low_score"))[0]
+
+            found[value_canonical] = [
+                (canonical_keys[columns[h]], float(scores[row, h]))
+                for h in hits
+            ]
+
+    return found
+
+
+# fuzzy_matches() egyenként pontozva, a teljes referencia listán (--verify_blocking)
+def scalar_matches(value_canonical, cfg, store, canonical_keys):
+
+    value_tokens = taxon_tokens(normalize_taxon(value_canonical))
+
+    value_compact = canonicalize_compact(value_canonical)
+
+    found = []
+
+    for i, candidate in enumerate(canonical_keys):
+
+        if cfg.get("scorer") == "taxon":
+
+            score = taxon_score(
+                *value_tokens,
+                store["genus"][i],
+                store["epithet"][i],
+                store["infra"][i],
+                store["count"][i]
+            )
+
+        else:
+
+            score = fuzz.token_set_ratio(
+                value_compact,
+                store["compact"][i]
+            )
+
+        if score >= cfg.get("low_score"):
+
+            found.append((candidate, float(score)))
+
+    return found
 
 
 results = []
 
+blocking_index = {}
+
+# érték -> eredmény, az azonos SSP konfigurációjú oszlopok közösen használják
+# None: pontos egyezés, nincs kimeneti sor
+validation_memo = {}
+
 for col, cfg in VALIDATION_CONFIG.items():
 
     print(f"\nValidation: {col}")
@@ -343,17 +883,107 @@ for col, cfg in VALIDATION_CONFIG.items():
 
     canonical_keys = list(lookup_canonical.keys())
 
+    store = cache["tokens"]
+
+    index_key = (cfg["file"], cfg["column"], cfg["scorer"])
+
+    if index_key not in blocking_index:
+
+        blocking_index[index_key] = build_blocking_index(
+            store,
+            cfg["scorer"]
+        )
+
+    blocks = blocking_index[index_key]
+
+    memo = validation_memo.setdefault(
+        (
+            cfg["file"],
+            cfg["column"],
+            cfg["scorer"],
+            cfg["low_score"],
+            cfg["high_score"]
+        ),
+        {}
+    )
+
     not_found_count = 0
 
-    for idx, value in df[col].items():
+    # a nem üres értékek, soronként
+    column_values = df[col].dropna().astype(str).str.strip()
 
-        if pd.isna(value):
-            continue
+    column_values = column_values[column_values != ""]
 
-        value = str(value).strip()
+    # minden különböző értéket csak egyszer validálunk
+    distinct_values = [
+        value
+        for value in column_values.unique()
+        if value not in memo
+    ]
 
-        if value == "":
-            continue
+    # korábbi futások eredményei
+    if match_cache:
+
+        cached = match_cache_get(
+            match_cache,
+            match_cache_keys[cfg["name"]],
+            distinct_values
+        )
+
+        memo.update(cached)
+
+        distinct_values = [
+            value
+            for value in distinct_values
+            if value not in cached
+        ]
+
+        print(f"Cached: {len(cached)} values")
+
+    # =================================================
+    # FUZZY: az oszlop nem egyező értékei egyszerre
+    # =================================================
+
+    fuzzy_values = set()
+
+    for value in distinct_values:
+
+        value_canonical = canonicalize(value)
+
+        if (
+            value not in lookup_set
+            and value_canonical not in lookup_canonical
+        ):
+
+            fuzzy_values.add(value_canonical)
+
+    fuzzy_values = sorted(fuzzy_values)
+
+    column_matches = fuzzy_matches(
+        fuzzy_values,
+        cfg,
+        store,
+        canonical_keys,
+        blocks
+    )
+
+    # ellenőrzés a teljes listán, egyenkénti pontozással:
+    # a blokkolás és a mátrix pontszámok együtt
+    if args.verify_blocking:
+
+        brute_matches = {
+            v: scalar_matches(v, cfg, store, canonical_keys)
+            for v in fuzzy_values
+        }
+
+        verify_total = sum(len(m) for m in brute_matches.values())
+
+        verify_found = sum(
+            len(set(brute_matches[v]) & set(column_matches[v]))
+            for v in fuzzy_values
+        )
+
+    for value in distinct_values:
 
         value_canonical = canonicalize(value)
 
@@ -363,6 +993,8 @@ for col, cfg in VALIDATION_CONFIG.items():
 
         if value in lookup_set:
 
+            memo[value] = None
+
             continue
 
         # =================================================
@@ -371,15 +1003,11 @@ for col, cfg in VALIDATION_CONFIG.items():
 
         if value_canonical in lookup_canonical:
 
-            results.append({
-                "dataframe_index": idx,
-                "csv_row": idx + 2,
-                "validated_column": col,
-                "original_value": value,
-                "match_type": "canonical_exact",
-                "fuzzy_score": 100,
-                "suggestions": lookup_canonical[value_canonical]
-            })
+            memo[value] = (
+                "canonical_exact",
+                100,
+                lookup_canonical[value_canonical]
+            )
 
             continue
 
@@ -387,36 +1015,9 @@ for col, cfg in VALIDATION_CONFIG.items():
         # 3. FUZZY
         # =================================================
 
-        not_found_count += 1
-
-        matches = []
-
-        for candidate in canonical_keys:
-
-            # For scientific names we have our own scorer: taxon_score()
-            if cfg.get("scorer") == "taxon":
-
-                score = taxon_score(
-                    value_canonical,
-                    candidate
-                )
-
-            # For national names we can use the built in token_set_ratio()
-            else:
-
-                score = fuzz.token_set_ratio(
-                    canonicalize_compact(value_canonical),
-                    canonicalize_compact(candidate)
-                )
-
-            if score >= cfg.get("low_score"):
-
-                matches.append(
-                    (
-                        candidate,
-                        score
-                    )
-                )
+        matches = list(
+            column_matches[value_canonical]
+        )
 
         # score szerint rendezés
         matches = sorted(
@@ -497,27 +1098,18 @@ for col, cfg in VALIDATION_CONFIG.items():
                             indexed_species
                         )
 
-                        if species_score >= 85:
+                        if species_score >= TAXON_WEIGHTS["epithet_min"]:
 
-                            for hit in hits:
+                            for hit, hit_genus in hits:
 
-                                hit_parts = normalize_taxon(hit)
-
-                                genus_score = 0
-
-                                if (
-                                    len(parts) > 0
-                                    and len(hit_parts) > 0
-                                ):
-
-                                    genus_score = fuzz.ratio(
-                                        parts[0],
-                                        hit_parts[0]
-                                    )
+                                genus_score = fuzz.ratio(
+                                    parts[0],
+                                    hit_genus
+                                )
 
                                 combined_score = (
-                                    species_score * 0.8
-                                    + genus_score * 0.2
+                                    species_score * TAXON_WEIGHTS["epithet"]
+                                    + genus_score * TAXON_WEIGHTS["epithet_genus"]
                                 )
 
                                 epithet_matches.append(
@@ -571,7 +1163,7 @@ for col, cfg in VALIDATION_CONFIG.items():
 
                         all_suggestions = []
 
-                        if best_score < 70:
+                        if best_score < EPITHET_PRIORITY_THRESHOLD:
 
                             all_suggestions.extend(
                                 rescue_hits
@@ -599,9 +1191,50 @@ for col, cfg in VALIDATION_CONFIG.items():
                             all_suggestions
                         )
 
-        # =================================================
-        # SAVE RESULT
-        # =================================================
+        memo[value] = (
+            match_type,
+            best_score,
+            suggestions
+        )
+
+    if match_cache:
+
+        match_cache_put(
+            match_cache,
+            match_cache_keys[cfg["name"]],
+            {
+                value: memo[value]
+                for value in distinct_values
+                if memo[value] is not None
+            }
+        )
+
+    # =================================================
+    # SAVE RESULT: minden sorra
+    # =================================================
+
+    for idx, value in column_values.items():
+
+        if memo[value] is None:
+            continue
+
+        match_type, best_score, suggestions = memo[value]
+
+        if match_type == "canonical_exact":
+
+            results.append({
+                "dataframe_index": idx,
+                "csv_row": idx + 2,
+                "validated_column": col,
+                "original_value": value,
+                "match_type": match_type,
+                "fuzzy_score": best_score,
+                "suggestions": suggestions
+            })
+
+            continue
+
+        not_found_count += 1
 
         results.append({
             "row_index": idx,
@@ -615,10 +1248,23 @@ for col, cfg in VALIDATION_CONFIG.items():
 
     print(f"Not found: {not_found_count}")
 
+    if args.verify_blocking:
+
+        recall = verify_found / verify_total if verify_total else 1
+
+        print(
+            f"Blocking recall: {recall:.4f} "
+            f"({verify_found}/{verify_total} matches)"
+        )
+
 # =========================================================
 # EXPORT
 # =========================================================
 
+if match_cache:
+
+    match_cache.close()
+
 result_df = pd.DataFrame(results)
 
 result_df.to_csv(